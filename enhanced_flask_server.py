@@ -7,6 +7,10 @@ This implementation provides a robust Linux terminal emulation with
 all file operations integrated into the terminal commands.
 """
 
+# Patch the standard library for gevent before anything else is imported
+from gevent import monkey
+monkey.patch_all()
+
 import os
 import uuid
 import time
@@ -15,7 +19,6 @@ import sys
 import signal
 import threading
 import logging
-import eventlet
 from datetime import datetime
 from flask import Flask, request, jsonify, send_from_directory, send_file, render_template, make_response
 from flask_cors import CORS
@@ -25,9 +28,6 @@ from terminal_command_handler import TerminalCommandHandler
 from session_manager import SessionManager
 from environment_setup import EnvironmentSetup
 
-# Use eventlet for WebSocket support
-eventlet.monkey_patch()
-
 # Create logs directory if it doesn't exist
 os.makedirs("logs", exist_ok=True)
 
@@ -48,6 +48,7 @@ PORT = int(os.environ.get('PORT', 3000))
 SESSION_TIMEOUT = int(os.environ.get('SESSION_TIMEOUT', 3600))  # 1 hour in seconds
 USER_DATA_DIR = os.environ.get('USER_DATA_DIR', 'user_data')
 SCRIPT_DIR = os.environ.get('SCRIPT_DIR', 'user_scripts')
+COMMAND_ACK_TIMEOUT = 60  # Seconds before a socket command is acknowledged as still running, as for HTTP commands
 
 # Create a Flask app
 app = Flask(__name__, static_folder='static')
@@ -74,7 +75,7 @@ def add_security_headers(response):
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
-    async_mode='eventlet',
+    async_mode='gevent',
     ping_timeout=30,
     ping_interval=15
 )
@@ -148,7 +149,7 @@ def handle_disconnect():
 
 @socketio.on('create_session')
 def handle_create_session(data):
-    """Create a new terminal session"""
+    """Create a new terminal session; the session information is also the acknowledgement"""
     try:
         user_id = data.get('userId', f'socket-user-{str(uuid.uuid4())}')
         client_ip = request.remote_addr
@@ -157,10 +158,9 @@ def handle_create_session(data):
         session_data = session_manager.create_session(user_id, client_ip)
         
         if 'error' in session_data:
-            socketio.emit('session_created', {
-                'error': session_data['error']
-            }, to=request.sid)
-            return
+            error = {'error': session_data['error']}
+            socketio.emit('session_created', error, to=request.sid)
+            return error
         
         session_id = session_data['sessionId']
         
@@ -174,12 +174,13 @@ def handle_create_session(data):
         socketio.emit('session_created', session_data, to=request.sid)
         
         logger.info(f"Created session {session_id} for user {user_id}")
+        return session_data
         
     except Exception as e:
         logger.error(f"Error creating session: {str(e)}")
-        socketio.emit('session_created', {
-            'error': f'Failed to create session: {str(e)}'
-        }, to=request.sid)
+        error = {'error': f'Failed to create session: {str(e)}'}
+        socketio.emit('session_created', error, to=request.sid)
+        return error
 
 @socketio.on('join_session')
 def handle_join_session(data):
@@ -239,7 +240,14 @@ def handle_end_session(data):
 
 @socketio.on('execute_command')
 def handle_execute_command(data):
-    """Execute a command in the terminal session with real-time output streaming"""
+    """
+    Execute a command in the terminal session with real-time output streaming.
+    
+    The acknowledgement is sent once the command has completed, with its
+    exit code, so clients can run commands one after another with call().
+    Commands still running after COMMAND_ACK_TIMEOUT seconds are
+    acknowledged with running set instead.
+    """
     try:
         # Validate input
         if not isinstance(data, dict):
@@ -311,25 +319,45 @@ def handle_execute_command(data):
                 }, to=request.sid)
                 return
         
-        # Initialize the environment if needed
+        # Create the home directory on first use and initialize the environment if needed
+        session_manager.ensure_home(session_id)
         if not os.path.exists(os.path.join(session['home_dir'], '.bashrc')):
             environment_setup.setup_user_environment(session['home_dir'])
         
-        # Define callback function for streaming output
+        # Define callback function for streaming output. It is also called from
+        # the terminal handler's output reactor, outside this request context,
+        # so the socket ID is captured here.
+        sid = request.sid
+        completion = {}
+        completed = threading.Event()
+        
         def output_callback(text, exit_code=None):
             if exit_code is not None:
                 # Command completed
-                socketio.emit('command_complete', {
+                completion.update({
                     'exitCode': exit_code,
                     'sessionRenewed': auto_renewed,
                     'newSessionId': session_id if auto_renewed else None
-                }, to=request.sid)
+                })
+                socketio.emit('command_complete', completion, to=sid)
+                completed.set()
             else:
                 # Stream output
-                socketio.emit('command_output', {'output': text}, to=request.sid)
+                socketio.emit('command_output', {'output': text}, to=sid)
         
         # Execute the command
-        terminal_handler.execute_command(command, session_id, session, output_callback)
+        result = terminal_handler.execute_command(command, session_id, session, output_callback)
+        
+        # Errors reported without completing through the callback
+        if 'error' in result and not completed.is_set():
+            socketio.emit('command_error', {'error': result['error']}, to=sid)
+            return {'error': result['error'], 'exitCode': result.get('exit_code', 1)}
+        
+        # Commands that keep streaming, or leave a background child holding
+        # the output pipes, are acknowledged as still running after a while
+        if not completed.wait(COMMAND_ACK_TIMEOUT):
+            return {'running': True, 'message': 'Command still running; completion will follow as command_complete'}
+        return completion
         
     except Exception as e:
         logger.error(f"Error handling command execution: {str(e)}")
@@ -377,7 +405,8 @@ def execute_command():
         if not session:
             return jsonify({'error': 'Invalid or expired session'}), 401
         
-        # Initialize the environment if needed
+        # Create the home directory on first use and initialize the environment if needed
+        session_manager.ensure_home(session_id)
         if not os.path.exists(os.path.join(session['home_dir'], '.bashrc')):
             environment_setup.setup_user_environment(session['home_dir'])
         
@@ -13,16 +13,23 @@ import cachetools.func
 import re
 import hashlib
 import logging
+from collections import OrderedDict, deque
 from datetime import datetime
 from container_pool import ContainerPool
-from flask import Flask, request, jsonify, send_from_directory, send_file, render_template, make_response
+from flask import Flask, request, g, jsonify, send_from_directory, send_file, render_template, make_response
 from flask_cors import CORS
 from flask_compress import Compress
+from flask_caching import Cache
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.security import generate_password_hash, check_password_hash
 import select
 import io
+import queue
 import eventlet
+try:
+    import orjson
+except ImportError:
+    orjson = None
 # Import file management with error handling
 try:
     from file_management import register_file_management_endpoints
@@ -121,6 +128,11 @@ app.config['SERVER_VERSION'] = 'flask-2.0.0'  # Server version for consistent re
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limit request size to 16MB
 app.config['PROPAGATE_EXCEPTIONS'] = True  # Make sure exceptions are properly propagated
 
+def ojson(obj, status=200):
+    """Build a JSON response, serialized with orjson when it is available"""
+    body = orjson.dumps(obj) if orjson else json.dumps(obj)
+    return app.response_class(body, status=status, mimetype='application/json')
+
 # Generate a secure random key if not provided in environment
 if os.environ.get('SECRET_KEY'):
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
@@ -264,12 +276,27 @@ try:
     mem = psutil.virtual_memory()
     print(f"Available memory: {mem.available / (1024*1024):.1f}MB / {mem.total / (1024*1024):.1f}MB")
 except ImportError:
+    psutil = None
     print("psutil not available - skipping memory check")
 
+# Cached psutil.Process for this worker - constructing one re-reads /proc
+_PROC = None
+
+def current_process():
+    """Return the cached psutil.Process for this worker, recreated after a fork"""
+    global _PROC
+    if _PROC is None or _PROC.pid != os.getpid():
+        _PROC = psutil.Process(os.getpid())
+    return _PROC
+
 # Initialize Flask-Compress for response compression
 compress = Compress()
 compress.init_app(app)
 
+# Initialize Flask-Caching for short-lived caching of idempotent endpoints
+cache = Cache(config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 1})
+cache.init_app(app)
+
 # Enable CORS with security-focused settings
 # In production, restrict origins to specific domains
 allowed_origins = os.environ.get('ALLOWED_ORIGINS', '*')
@@ -334,7 +361,7 @@ print(f"Current eventlet version: {eventlet.__version__}")
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    print(f"Client connected: {request.sid}")
+    logger.debug("Client connected: %s", request.sid)
     
     # Check for existing session ID in the connection request
     session_id = request.args.get('sessionId')
@@ -354,14 +381,14 @@ def handle_connect():
                 'message': 'Reconnected to existing session'
             }, to=request.sid)
             
-            print(f"Socket {request.sid} reconnected to session {session_id}")
+            logger.debug("Socket %s reconnected to session %s", request.sid, session_id)
     
     socketio.emit('status', {'status': 'connected'}, to=request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    print(f"Client disconnected: {request.sid}")
+    logger.debug("Client disconnected: %s", request.sid)
     # Clean up any running processes for this socket
     if request.sid in socket_sessions:
         session_id = socket_sessions[request.sid]
@@ -371,9 +398,9 @@ def handle_disconnect():
                 process_info = socket_processes[session_id]
                 os.killpg(os.getpgid(process_info['process'].pid), signal.SIGTERM)
                 del socket_processes[session_id]
-                print(f"Terminated process for session {session_id}")
+                logger.debug("Terminated process for session %s", session_id)
             except Exception as e:
-                print(f"Error terminating process: {str(e)}")
+                logger.error("Error terminating process: %s", e)
         # Remove socket session mapping
         del socket_sessions[request.sid]
 
@@ -385,7 +412,7 @@ def handle_create_session(data):
         client_ip = request.remote_addr
         
         # Create a new session
-        session_id = str(uuid.uuid4())
+        session_id = uuid.uuid4().hex
         home_dir = os.path.join('user_data', session_id)
         
         # Set up the user environment with necessary files
@@ -393,6 +420,7 @@ def handle_create_session(data):
         
         with session_lock:
             sessions[session_id] = {
+                'session_id': session_id,
                 'user_id': user_id,
                 'client_ip': client_ip,
                 'created': time.time(),
@@ -549,7 +577,7 @@ def handle_execute_command(data):
             client_ip = request.remote_addr
             
             # Create a new session
-            new_session_id = str(uuid.uuid4())
+            new_session_id = uuid.uuid4().hex
             home_dir = os.path.join('user_data', new_session_id)
             
             # Set up the user environment with necessary files
@@ -557,6 +585,7 @@ def handle_execute_command(data):
             
             with session_lock:
                 sessions[new_session_id] = {
+                    'session_id': new_session_id,
                     'user_id': user_id,
                     'client_ip': client_ip,
                     'created': time.time(),
@@ -797,68 +826,53 @@ def handle_execute_command(data):
             # Find and prepare the OpenSSL wrapper with all possible methods
             local_bin_dir = os.path.join(abs_home_dir, '.local', 'bin')
             openssl_wrapper = os.path.join(local_bin_dir, 'openssl-wrapper')
-            source_wrapper = os.path.join('user_scripts', 'openssl-wrapper')
-            abs_source_wrapper = os.path.abspath(source_wrapper)
+            src_path = OPENSSL_WRAPPER_SOURCE
             
             # Extra diagnostic logging
             print(f"OpenSSL wrapper paths:")
             print(f"  Target: {openssl_wrapper}")
-            print(f"  Source: {source_wrapper}")
-            print(f"  Abs source: {abs_source_wrapper}")
-            
-            # Try multiple paths for the source wrapper
-            wrapper_source_paths = [
-                source_wrapper,
-                abs_source_wrapper,
-                '/app/user_scripts/openssl-wrapper',
-                os.path.join(os.getcwd(), 'user_scripts', 'openssl-wrapper')
-            ]
+            print(f"  Source: {src_path}")
             
-            wrapper_found = False
-            # Check all possible source paths
-            for src_path in wrapper_source_paths:
-                if os.path.exists(src_path):
-                    print(f"Found source wrapper at: {src_path}")
-                    wrapper_found = True
-                    # Try all copy methods with this source
+            wrapper_found = src_path is not None
+            if wrapper_found:
+                # Try all copy methods with the resolved source
+                try:
+                    # Method 1: Direct file read/write
+                    with open(src_path, 'rb') as src:
+                        wrapper_content = src.read()
+                        with open(openssl_wrapper, 'wb') as dst:
+                            dst.write(wrapper_content)
+                    os.chmod(openssl_wrapper, 0o777)
+                    print(f"Successfully copied wrapper script (Method 1)")
+                except Exception as copy_error:
+                    print(f"Method 1 failed: {str(copy_error)}")
                     try:
-                        # Method 1: Direct file read/write
-                        with open(src_path, 'rb') as src:
-                            wrapper_content = src.read()
-                            with open(openssl_wrapper, 'wb') as dst:
-                                dst.write(wrapper_content)
+                        # Method 2: shutil
+                        shutil.copy2(src_path, openssl_wrapper)
                         os.chmod(openssl_wrapper, 0o777)
-                        print(f"Successfully copied wrapper script (Method 1)")
-                        break  # Successfully copied
+                        print(f"Successfully copied wrapper script (Method 2)")
                     except Exception as copy_error:
-                        print(f"Method 1 failed: {str(copy_error)}")
+                        print(f"Method 2 failed: {str(copy_error)}")
                         try:
-                            # Method 2: shutil
-                            shutil.copy2(src_path, openssl_wrapper)
+                            # Method 3: Plain content copy without metadata
+                            shutil.copyfile(src_path, openssl_wrapper)
                             os.chmod(openssl_wrapper, 0o777)
-                            print(f"Successfully copied wrapper script (Method 2)")
-                            break
+                            print(f"Successfully copied wrapper script (Method 3)")
                         except Exception as copy_error:
-                            print(f"Method 2 failed: {str(copy_error)}")
-                            try:
-                                # Method 3: Shell command
-                                subprocess.run(["cp", src_path, openssl_wrapper], check=True)
-                                subprocess.run(["chmod", "777", openssl_wrapper], check=False)
-                                print(f"Successfully copied wrapper script (Method 3)")
-                                break
-                            except Exception as copy_error:
-                                print(f"All wrapper copy methods failed: {str(copy_error)}")
+                            print(f"All wrapper copy methods failed: {str(copy_error)}")
             
             if not wrapper_found:
                 print(f"ERROR: OpenSSL wrapper source was not found in any location!")
-                # List current directory contents
-                try:
-                    print(f"Current directory: {os.getcwd()}")
-                    print(f"Contents: {os.listdir('.')}")
-                    if os.path.exists('user_scripts'):
-                        print(f"user_scripts contents: {os.listdir('user_scripts')}")
-                except Exception as e:
-                    print(f"Error listing directories: {str(e)}")
+                # List current directory contents, at most once a minute per session
+                if session_id not in wrapper_diagnostic_sessions:
+                    wrapper_diagnostic_sessions[session_id] = True
+                    try:
+                        print(f"Current directory: {os.getcwd()}")
+                        print(f"Contents: {list_directory('.')}")
+                        if os.path.exists('user_scripts'):
+                            print(f"user_scripts contents: {list_directory('user_scripts')}")
+                    except Exception as e:
+                        print(f"Error listing directories: {str(e)}")
                 
                 socketio.emit('command_output', {
                     'output': "Warning: OpenSSL wrapper script not found. Using direct OpenSSL command.\n"
@@ -874,7 +888,6 @@ def handle_execute_command(data):
                     # Try to fix permissions again
                     try:
                         os.chmod(openssl_wrapper, 0o777)
-                        subprocess.run(["chmod", "777", openssl_wrapper], check=False)
                         wrapper_status = "Permissions fixed"
                     except Exception as e:
                         print(f"Failed to fix permissions: {str(e)}")
@@ -931,13 +944,12 @@ def handle_execute_command(data):
         if not os.path.exists(openssl_wrapper) or not os.access(openssl_wrapper, os.X_OK):
             try:
                 # Copy the script from the source location
-                source_wrapper = os.path.join('user_scripts', 'openssl-wrapper')
-                if os.path.exists(source_wrapper):
-                    shutil.copy2(source_wrapper, openssl_wrapper)
+                if OPENSSL_WRAPPER_SOURCE:
+                    shutil.copy2(OPENSSL_WRAPPER_SOURCE, openssl_wrapper)
                     os.chmod(openssl_wrapper, 0o755)
                     print(f"Copied openssl-wrapper to {openssl_wrapper}")
                 else:
-                    print(f"Source openssl-wrapper not found at {source_wrapper}")
+                    print(f"Source openssl-wrapper not found in {OPENSSL_WRAPPER_SOURCE_PATHS}")
                     socketio.emit('command_output', {
                         'output': "Warning: OpenSSL wrapper script not found. Using direct OpenSSL command."
                     }, to=request.sid)
@@ -1095,8 +1107,8 @@ def handle_execute_command(data):
                     'newSessionId': session_id if auto_renewed else None
                 }, to=request.sid)
         
-        # Start output streaming in a separate thread
-        threading.Thread(target=stream_output, daemon=True).start()
+        # Stream output from a green thread on the eventlet hub
+        eventlet.spawn(stream_output)
         
     except Exception as e:
         print(f"Error executing command: {str(e)}")
@@ -1153,15 +1165,34 @@ MAX_POOL_AGE = int(os.environ.get('MAX_POOL_AGE', 1800))  # 30 minutes in second
 os.makedirs('logs', exist_ok=True)
 os.makedirs('user_data', exist_ok=True)
 
+# Candidate locations of the OpenSSL wrapper script, resolved once at import
+# time so openssl commands don't probe the filesystem on every request
+OPENSSL_WRAPPER_SOURCE_PATHS = [
+    os.path.join('user_scripts', 'openssl-wrapper'),
+    os.path.abspath(os.path.join('user_scripts', 'openssl-wrapper')),
+    '/app/user_scripts/openssl-wrapper',
+    '/user_scripts/openssl-wrapper'
+]
+OPENSSL_WRAPPER_SOURCE = next(
+    (os.path.abspath(path) for path in OPENSSL_WRAPPER_SOURCE_PATHS if os.path.exists(path)), None
+)
+
+# Sessions that recently dumped missing-wrapper diagnostics, used to rate-limit the dump
+wrapper_diagnostic_sessions = cachetools.TTLCache(maxsize=1024, ttl=60)
+
+def list_directory(path):
+    """List the entry names of a directory in a single scandir pass"""
+    with os.scandir(path) as entries:
+        return [entry.name for entry in entries]
+
 # Setup memory monitor to prevent OOM killer
 def monitor_memory_usage():
     """
     Monitor memory usage and take action if it gets too high
-    This runs in a background thread to prevent OOM killer
+    This runs in a background green thread to prevent OOM killer
     """
     import gc
     import time
-    import psutil
     import logging
     
     logging.basicConfig(
@@ -1184,7 +1215,7 @@ def monitor_memory_usage():
     
     # Record startup memory usage as baseline
     try:
-        process = psutil.Process(worker_pid)
+        process = current_process()
         startup_mem = process.memory_info().rss / (1024 * 1024)
         logging.info(f"Initial memory usage: {startup_mem:.1f} MB")
         print(f"Initial memory usage: {startup_mem:.1f} MB")
@@ -1194,7 +1225,7 @@ def monitor_memory_usage():
     while True:
         try:
             # Get current memory usage
-            process = psutil.Process(worker_pid)
+            process = current_process()
             mem_info = process.memory_info()
             mem_percent = process.memory_percent()
             mem_mb = mem_info.rss / (1024 * 1024)
@@ -1209,7 +1240,7 @@ def monitor_memory_usage():
                 gc.collect()
                 
                 # Log memory after GC
-                gc_mem = psutil.Process(worker_pid).memory_info().rss / (1024 * 1024)
+                gc_mem = current_process().memory_info().rss / (1024 * 1024)
                 logging.info(f"Memory after GC: {gc_mem:.1f} MB (saved {mem_mb - gc_mem:.1f} MB)")
             
             # Critical level - release caches
@@ -1225,7 +1256,7 @@ def monitor_memory_usage():
                 gc.collect()
                 
                 # Log memory after cache clearing
-                cache_clear_mem = psutil.Process(worker_pid).memory_info().rss / (1024 * 1024)
+                cache_clear_mem = current_process().memory_info().rss / (1024 * 1024)
                 logging.info(f"Memory after cache clearing: {cache_clear_mem:.1f} MB (saved {mem_mb - cache_clear_mem:.1f} MB)")
             
             # Emergency level - take drastic action
@@ -1251,25 +1282,26 @@ def monitor_memory_usage():
                 gc.collect()
                 
                 # Final memory check
-                final_mem = psutil.Process(worker_pid).memory_info().rss / (1024 * 1024)
+                final_mem = current_process().memory_info().rss / (1024 * 1024)
                 logging.info(f"Memory after emergency actions: {final_mem:.1f} MB (saved {mem_mb - final_mem:.1f} MB)")
         
         except Exception as e:
             logging.error(f"Memory monitor error in worker {worker_pid}: {str(e)}")
         
-        # Sleep before next check
-        time.sleep(CHECK_INTERVAL)
+        # Yield to the eventlet hub until the next check
+        eventlet.sleep(CHECK_INTERVAL)
 
 # Start memory monitor in background thread
 try:
-    import psutil
+    if psutil is None:
+        raise ImportError("psutil")
     # Print memory info before starting monitor to help diagnose worker failures
-    process = psutil.Process(os.getpid())
+    process = current_process()
     mem_info = process.memory_info()
     print(f"Worker {os.getpid()} starting with {mem_info.rss / (1024 * 1024):.1f} MB memory usage")
     
-    memory_monitor_thread = threading.Thread(target=monitor_memory_usage, daemon=True)
-    memory_monitor_thread.start()
+    # Run as a green thread on the eventlet hub rather than an OS thread
+    memory_monitor_thread = eventlet.spawn(monitor_memory_usage)
 except ImportError:
     print("Warning: psutil not installed. Memory monitoring disabled.")
 except Exception as e:
@@ -1287,17 +1319,54 @@ session_pool_lock = threading.Lock()
 pool_initialization_in_progress = False
 
 
+# Queue of pending audit log events, drained by a background writer thread
+# so that request handlers never block on log file I/O
+_log_queue = queue.Queue()
+LOG_BATCH_SIZE = 100  # Maximum events written per batch
+
+
 def log_activity(log_type, data):
-    """Log activity to a file"""
-    log_file = os.path.join('logs', f"{log_type}.log")
-    timestamp = datetime.now().isoformat()
-    log_entry = {
-        'timestamp': timestamp,
-        **data
-    }
+    """Queue an activity entry to be appended to its log file"""
+    _log_queue.put(('activity', log_type, time.time(), data))
+
+
+def _write_log_batch(batch):
+    """Write a batch of queued log events, opening each log file once"""
+    entries_by_file = {}
+    for kind, key, timestamp, data in batch:
+        if kind == 'file_access':
+            _record_file_access(key, timestamp, *data)
+            continue
+        
+        log_entry = {
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            **data
+        }
+        entries_by_file.setdefault(key, []).append(json.dumps(log_entry) + '\n')
     
-    with open(log_file, 'a') as f:
-        f.write(json.dumps(log_entry) + '\n')
+    for log_type, lines in entries_by_file.items():
+        log_file = os.path.join('logs', f"{log_type}.log")
+        with open(log_file, 'a') as f:
+            f.writelines(lines)
+
+
+def _log_writer():
+    """Drain the log queue, batching events that arrive together"""
+    while True:
+        batch = [_log_queue.get()]
+        try:
+            while len(batch) < LOG_BATCH_SIZE:
+                batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        try:
+            _write_log_batch(batch)
+        except Exception as e:
+            logger.error(f"Error writing activity log batch: {str(e)}")
+
+
+threading.Thread(target=_log_writer, daemon=True).start()
 
 
 # Templates for fast file creation
@@ -2091,22 +2160,32 @@ cleanup_sessions()
 
 
 def authenticate():
-    """Authenticate the request if authentication is enabled"""
+    """Authenticate the request if authentication is enabled
+    
+    The result is memoized on flask.g so repeated checks within a request are free.
+    """
     if not USE_AUTH:
         return True
         
+    if 'auth_ok' in g:
+        return g.auth_ok
+        
     api_key = request.headers.get('X-API-Key')
-    if not api_key or api_key != API_KEY:
-        return False
-    
-    return True
+    g.auth_ok = bool(api_key) and api_key == API_KEY
+    return g.auth_ok
+
 
+# Upper bounds for the in-memory tracking maps below; least recently used
+# entries are evicted first
+MAX_USER_SESSIONS = int(os.environ.get('MAX_USER_SESSIONS', 10000))
+MAX_FILE_ACCESS_LOGS = int(os.environ.get('MAX_FILE_ACCESS_LOGS', 1000))
+FILE_ACCESS_LOG_SIZE = 100  # Entries kept per session
 
-# Map of user IDs to their active sessions for cross-endpoint session tracking
-user_sessions = {}
+# Map of user IDs to their active session dicts for cross-endpoint session tracking
+user_sessions = OrderedDict()
 
 # Track file operations by session for improved security and debugging
-file_access_log = {}
+file_access_log = OrderedDict()
 
 def log_session_redirect(original_session_id, new_session_id, user_id):
     """Log session redirections for security auditing"""
@@ -2118,22 +2197,31 @@ def log_session_redirect(original_session_id, new_session_id, user_id):
     }
     
     # In a production environment, you might want to store this in a database
-    print(f"Session redirect: {original_session_id} → {new_session_id} for user {user_id}")
+    logger.info("Session redirect: %s → %s for user %s", original_session_id, new_session_id, user_id)
     
 def log_file_access(session_id, path, method):
     """Log file access for security auditing"""
-    if session_id not in file_access_log:
-        file_access_log[session_id] = []
+    _log_queue.put(('file_access', session_id, time.time(), (path, method)))
+
+
+def _record_file_access(session_id, timestamp, path, method):
+    """Record a queued file access event in the in-memory audit log"""
+    # The per-session deque keeps only the most recent entries
+    entries = file_access_log.get(session_id)
+    if entries is None:
+        entries = file_access_log[session_id] = deque(maxlen=FILE_ACCESS_LOG_SIZE)
+    else:
+        file_access_log.move_to_end(session_id)
         
-    file_access_log[session_id].append({
-        'timestamp': time.time(),
+    entries.append({
+        'timestamp': timestamp,
         'path': path,
         'method': method
     })
     
-    # Keep the log from growing too large
-    if len(file_access_log[session_id]) > 100:
-        file_access_log[session_id] = file_access_log[session_id][-100:]
+    # Keep the log from tracking too many sessions
+    while len(file_access_log) > MAX_FILE_ACCESS_LOGS:
+        file_access_log.popitem(last=False)
 
 def get_session(session_id):
     """Get and validate a session"""
@@ -2142,24 +2230,31 @@ def get_session(session_id):
             
             # If not found, check if user has other active sessions
             session_data = request.headers.get('X-Session-Data')
-            if session_data:
-                try:
-                    # Try to parse session data from headers
-                    data = json.loads(session_data)
-                    if 'userId' in data and data['userId'] in user_sessions:
-                        alt_session_id = user_sessions[data['userId']]
-                        if alt_session_id in sessions:
-                            # Log the session redirection
-                            print(f"Redirecting to alternate session {alt_session_id} for user {data['userId']}")
-                            
-                            # Track the redirection for security auditing
-                            log_session_redirect(session_id, alt_session_id, data['userId'])
-                            
-                            # Return the alternate session
-                            return sessions[alt_session_id]
-                except:
-                    # Ignore parsing errors
-                    pass
+            if not session_data:
+                return None
+            
+            try:
+                # Try to parse session data from headers
+                data = orjson.loads(session_data) if orjson else json.loads(session_data)
+            except ValueError:
+                # Ignore parsing errors
+                return None
+            
+            user_id = data.get('userId') if isinstance(data, dict) else None
+            alt_session = user_sessions.get(user_id) if isinstance(user_id, str) else None
+            # The tracked session carries its own ID; it is only
+            # used while it is still the registered session
+            if alt_session is not None:
+                alt_session_id = alt_session['session_id']
+                if sessions.get(alt_session_id) is alt_session:
+                    # Log the session redirection
+                    logger.debug("Redirecting to alternate session %s for user %s", alt_session_id, user_id)
+                    
+                    # Track the redirection for security auditing
+                    log_session_redirect(session_id, alt_session_id, user_id)
+                    
+                    # Return the alternate session
+                    return alt_session
                 
             return None
             
@@ -2176,7 +2271,10 @@ def get_session(session_id):
         
         # Track active sessions by user ID for cross-endpoint persistence
         if 'user_id' in session and session['user_id']:
-            user_sessions[session['user_id']] = session_id
+            user_sessions[session['user_id']] = session
+            user_sessions.move_to_end(session['user_id'])
+            while len(user_sessions) > MAX_USER_SESSIONS:
+                user_sessions.popitem(last=False)
             
         return session
 
@@ -2265,7 +2363,7 @@ def initialize_session_pool():
             new_sessions = []
             
             for _ in range(needed_sessions):
-                session_id = str(uuid.uuid4())
+                session_id = uuid.uuid4().hex
                 home_dir = os.path.join('user_data', session_id)
                 
                 # Create the session in a controlled process
@@ -2371,7 +2469,7 @@ def create_session():
             print(f"Created deterministic session ID for device isolation: {session_id}")
         else:
             # Fallback to random UUID if no device ID
-            session_id = str(uuid.uuid4())
+            session_id = uuid.uuid4().hex
             print(f"Created random session ID: {session_id}")
             
         home_dir = os.path.join('user_data', session_id)
@@ -2396,6 +2494,7 @@ def create_session():
     # Register the session
     with session_lock:
         sessions[session_id] = {
+            'session_id': session_id,
             'user_id': user_id,
             'client_ip': client_ip,
             'created': time.time(),
@@ -2485,7 +2584,7 @@ def execute_command():
                 client_ip = request.remote_addr
                 
                 # Create a new session
-                session_id = str(uuid.uuid4())
+                session_id = uuid.uuid4().hex
                 home_dir = os.path.join('user_data', session_id)
                 
                 # Set up the user environment with necessary files
@@ -2493,6 +2592,7 @@ def execute_command():
                 
                 with session_lock:
                     sessions[session_id] = {
+                        'session_id': session_id,
                         'user_id': user_id,
                         'client_ip': client_ip,
                         'created': time.time(),
@@ -2519,7 +2619,7 @@ def execute_command():
         client_ip = request.remote_addr
         
         # Create a new session
-        new_session_id = str(uuid.uuid4())
+        new_session_id = uuid.uuid4().hex
         home_dir = os.path.join('user_data', new_session_id)
         
         # Set up the user environment with necessary files
@@ -2527,6 +2627,7 @@ def execute_command():
         
         with session_lock:
             sessions[new_session_id] = {
+                'session_id': new_session_id,
                 'user_id': user_id,
                 'client_ip': client_ip,
                 'created': time.time(),
@@ -2803,57 +2904,45 @@ def execute_command():
                 os.chmod(local_bin_dir, 0o777)  # Make it fully writable
                 print(f"OpenSSL command detected - preparing environment at {local_bin_dir}")
                 
-                # Try multiple possible locations for the source wrapper
-                source_paths = [
-                    os.path.join('user_scripts', 'openssl-wrapper'),
-                    os.path.abspath(os.path.join('user_scripts', 'openssl-wrapper')),
-                    '/app/user_scripts/openssl-wrapper',
-                    os.path.join(os.getcwd(), 'user_scripts', 'openssl-wrapper'),
-                    '/user_scripts/openssl-wrapper'
-                ]
-                
+                source_wrapper = OPENSSL_WRAPPER_SOURCE
                 wrapper_found = False
-                for source_wrapper in source_paths:
-                    if os.path.exists(source_wrapper):
-                        print(f"Found openssl-wrapper at: {source_wrapper}")
+                if source_wrapper:
+                    print(f"Found openssl-wrapper at: {source_wrapper}")
+                    
+                    # Try multiple copy methods
+                    # Method 1: Direct file read/write
+                    try:
+                        with open(source_wrapper, 'rb') as src:
+                            wrapper_content = src.read()
+                            with open(openssl_wrapper, 'wb') as dst:
+                                dst.write(wrapper_content)
+                        os.chmod(openssl_wrapper, 0o777)  # Make fully executable
+                        wrapper_found = True
+                        print(f"✓ Successfully copied openssl-wrapper (direct file copy)")
+                    except Exception as copy_error:
+                        print(f"Direct copy failed: {str(copy_error)}")
                         
-                        # Try multiple copy methods
-                        # Method 1: Direct file read/write
+                        # Method 2: Try shutil
                         try:
-                            with open(source_wrapper, 'rb') as src:
-                                wrapper_content = src.read()
-                                with open(openssl_wrapper, 'wb') as dst:
-                                    dst.write(wrapper_content)
-                            os.chmod(openssl_wrapper, 0o777)  # Make fully executable
+                            shutil.copy2(source_wrapper, openssl_wrapper)
+                            os.chmod(openssl_wrapper, 0o777)
                             wrapper_found = True
-                            print(f"✓ Successfully copied openssl-wrapper (direct file copy)")
-                            break
+                            print(f"✓ Successfully copied openssl-wrapper (shutil)")
                         except Exception as copy_error:
-                            print(f"Direct copy failed: {str(copy_error)}")
+                            print(f"Shutil copy failed: {str(copy_error)}")
                             
-                            # Method 2: Try shutil
+                            # Method 3: Plain content copy without metadata
                             try:
-                                shutil.copy2(source_wrapper, openssl_wrapper)
+                                shutil.copyfile(source_wrapper, openssl_wrapper)
                                 os.chmod(openssl_wrapper, 0o777)
                                 wrapper_found = True
-                                print(f"✓ Successfully copied openssl-wrapper (shutil)")
-                                break
+                                print(f"✓ Successfully copied openssl-wrapper (copyfile)")
                             except Exception as copy_error:
-                                print(f"Shutil copy failed: {str(copy_error)}")
-                                
-                                # Method 3: Shell command
-                                try:
-                                    subprocess.run(f"cat '{source_wrapper}' > '{openssl_wrapper}'", shell=True, check=True)
-                                    subprocess.run(["chmod", "777", openssl_wrapper], check=True)
-                                    wrapper_found = True
-                                    print(f"✓ Successfully copied openssl-wrapper (shell)")
-                                    break
-                                except Exception as copy_error:
-                                    print(f"Shell copy failed: {str(copy_error)}")
+                                print(f"Copyfile failed: {str(copy_error)}")
                 
                 if not wrapper_found:
                     print(f"ERROR: Could not find or copy openssl-wrapper from any location")
-                    print(f"Searched in: {source_paths}")
+                    print(f"Searched in: {OPENSSL_WRAPPER_SOURCE_PATHS}")
             except Exception as e:
                 print(f"Failed to set up openssl-wrapper: {str(e)}")
 
@@ -2875,7 +2964,6 @@ def execute_command():
                 # Try one more time to fix permissions
                 try:
                     os.chmod(openssl_wrapper, 0o777)
-                    subprocess.run(["chmod", "777", openssl_wrapper], check=False)
                     print(f"Attempted to fix permissions")
                 except Exception as e:
                     print(f"Failed to fix permissions: {str(e)}")
@@ -3138,60 +3226,89 @@ def execute_command():
 def session_info():
     """Get information about the current session"""
     if USE_AUTH and not authenticate():
-        return jsonify({'error': 'Authentication failed'}), 401
+        return ojson({'error': 'Authentication failed'}, 401)
         
     session_id = request.headers.get('X-Session-Id')
     if not session_id:
-        return jsonify({'error': 'Session ID is required'}), 400
+        return ojson({'error': 'Session ID is required'}, 400)
         
+    info = get_session_info(session_id)
+    if not info:
+        return ojson({'error': 'Invalid or expired session'}, 401)
+        
+    return ojson(info)
+
+
+@cache.memoize(timeout=5)
+def get_session_info(session_id):
+    """Build the session info payload, cached briefly per session ID"""
     session = get_session(session_id)
     if not session:
-        return jsonify({'error': 'Invalid or expired session'}), 401
+        return None
+        
+    # The creation time never changes, so format it once and keep it on the session
+    created_iso = session.get('created_iso')
+    if created_iso is None:
+        created_iso = datetime.fromtimestamp(session['created']).isoformat()
+        session['created_iso'] = created_iso
         
-    return jsonify({
+    last_accessed = session['last_accessed']
+    return {
         'userId': session['user_id'],
-        'created': datetime.fromtimestamp(session['created']).isoformat(),
-        'lastAccessed': datetime.fromtimestamp(session['last_accessed']).isoformat(),
-        'expiresIn': int(SESSION_TIMEOUT - (time.time() - session['last_accessed'])) * 1000  # ms
-    })
+        'created': created_iso,
+        'lastAccessed': datetime.fromtimestamp(last_accessed).isoformat(),
+        'expiresIn': int((SESSION_TIMEOUT - (time.time() - last_accessed)) * 1000)  # ms
+    }
 
 
 @app.route('/session', methods=['DELETE'])
 def delete_session():
     """Delete a session"""
     if USE_AUTH and not authenticate():
-        return jsonify({'error': 'Authentication failed'}), 401
+        return ojson({'error': 'Authentication failed'}, 401)
         
     session_id = request.headers.get('X-Session-Id')
     if not session_id:
-        return jsonify({'error': 'Session ID is required'}), 400
+        return ojson({'error': 'Session ID is required'}, 400)
         
     with session_lock:
-        if session_id in sessions:
-            log_activity('session', {
-                'action': 'deleted',
-                'session_id': session_id,
-                'user_id': sessions[session_id]['user_id']
-            })
-            
-            # Cleanup session data
-            home_dir = sessions[session_id]['home_dir']
-            del sessions[session_id]
-            
-            # Could delete user data here, but we'll leave it for now
-            # import shutil
-            # shutil.rmtree(home_dir, ignore_errors=True)
+        deleted_session = sessions.pop(session_id, None)
+        
+    if deleted_session:
+        log_activity('session', {
+            'action': 'deleted',
+            'session_id': session_id,
+            'user_id': deleted_session['user_id']
+        })
+        
+        # Could delete user data here, but we'll leave it for now
+        # import shutil
+        # shutil.rmtree(deleted_session['home_dir'], ignore_errors=True)
     
-    return jsonify({'message': 'Session terminated successfully'})
+    # Drop any cached session info so the deletion is visible immediately
+    cache.delete_memoized(get_session_info, session_id)
+    
+    return ojson({'message': 'Session terminated successfully'})
 
 
+# Pre-serialized /health body - the fixed fields are rendered once at startup
+# and only the dynamic values are formatted in on each request
+HEALTH_TEMPLATE = (
+    b'{"status":"ok","activeSessions":%d,'
+    b'"version":' + json.dumps(app.config['SERVER_VERSION']).replace('%', '%%').encode() + b','
+    b'"uptime":%.3f,'
+    b'"memory":{"percent":"%.1f%%","used_mb":%.2f,"status":"%b"},'
+    b'"pooledSessions":%d,'
+    b'"systemLoad":{"1min":%.2f,"5min":%.2f,"15min":%.2f},'
+    b'"cacheStats":{"responseCache":{"size":%d,"hits":%d,"misses":%d},"fileCache":%d}}'
+)
+
 @app.route('/health', methods=['GET'])
+@cache.cached(timeout=2)
 def health_check():
     """Health check endpoint with enhanced diagnostics"""
-    import psutil
-    
     # Gather system stats
-    process = psutil.Process(os.getpid())
+    process = current_process()
     mem_info = process.memory_info()
     mem_percent = process.memory_percent()
     
@@ -3216,31 +3333,20 @@ def health_check():
         memory_status = "warning"
     
     # Return comprehensive health information
-    return jsonify({
-        'status': 'ok',
-        'activeSessions': active_sessions,
-        'version': app.config['SERVER_VERSION'],
-        'uptime': time.time() - app.config.get('START_TIME', time.time()),
-        'memory': {
-            'percent': f"{mem_percent:.1f}%",
-            'used_mb': mem_info.rss / (1024 * 1024),
-            'status': memory_status
-        },
-        'pooledSessions': available_pool_sessions,
-        'systemLoad': {
-            '1min': load_avg[0],
-            '5min': load_avg[1],
-            '15min': load_avg[2]
-        },
-        'cacheStats': {
-            'responseCache': {
-                'size': len(response_cache),
-                'hits': response_cache_hits,
-                'misses': response_cache_misses
-            },
-            'fileCache': getattr(file_content_cache, 'currsize', 0)
-        }
-    })
+    body = HEALTH_TEMPLATE % (
+        active_sessions,
+        time.time() - app.config.get('START_TIME', time.time()),
+        mem_percent,
+        mem_info.rss / (1024 * 1024),
+        memory_status.encode(),
+        available_pool_sessions,
+        load_avg[0], load_avg[1], load_avg[2],
+        len(response_cache),
+        response_cache_hits,
+        response_cache_misses,
+        getattr(file_content_cache, 'currsize', 0)
+    )
+    return app.response_class(body, mimetype='application/json')
 
 
 # Register file management endpoints with Flask app
@@ -3248,8 +3354,9 @@ def health_check():
 @app.before_request
 def secure_file_access():
     """Ensure users can only access their own files"""
-    # Only apply to file management endpoints
-    if not request.path.startswith('/files/'):
+    # Only apply to file management endpoints; the endpoint was already
+    # resolved by URL matching so this is a set lookup
+    if request.endpoint not in FILE_ACCESS_ENDPOINTS:
         return None
         
     session_id = request.headers.get('X-Session-Id')
@@ -3271,11 +3378,18 @@ def secure_file_access():
     if not base_dir:
         return None
         
-    target_path = os.path.normpath(os.path.join(base_dir, path))
+    # Resolve the home directory once per session and keep it with a trailing
+    # separator so a plain prefix test cannot match sibling directories
+    home_dir_norm = session.get('home_dir_norm')
+    if home_dir_norm is None:
+        home_dir_norm = os.path.join(os.path.realpath(base_dir), '')
+        session['home_dir_norm'] = home_dir_norm
+        
+    target_path = os.path.realpath(os.path.join(home_dir_norm, path))
     
     # Strict security: ensure path is within the user's home directory
-    if not target_path.startswith(base_dir):
-        return jsonify({'error': 'Access denied: path outside user directory'}), 403
+    if target_path != home_dir_norm[:-1] and not target_path.startswith(home_dir_norm):
+        return ojson({'error': 'Access denied: path outside user directory'}, 403)
         
     # Log file access for security auditing
     log_file_access(session_id, target_path, request.method)
@@ -3285,6 +3399,12 @@ def secure_file_access():
 # Moved here after get_session is defined to avoid NameError
 register_file_management_endpoints(app, get_session)
 
+# Endpoints guarded by secure_file_access, collected once from the URL map
+FILE_ACCESS_ENDPOINTS = frozenset(
+    rule.endpoint for rule in app.url_map.iter_rules()
+    if rule.rule.startswith('/files/')
+)
+
 # Serve the file browser interface
 @app.route('/files-browser')
 def file_browser():
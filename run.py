@@ -11,11 +11,16 @@ import signal
 import logging
 import eventlet
 import gc
-import threading
-import time
-from threading import Thread
 from flask_socketio import SocketIO
 
+try:
+    import psutil
+    # Constructing a Process re-reads /proc, so build it once and reuse it
+    PROCESS = psutil.Process(os.getpid())
+except ImportError:
+    psutil = None
+    PROCESS = None
+
 # Create logs directory if it doesn't exist
 try:
     os.makedirs("logs", exist_ok=True)
@@ -57,18 +62,18 @@ def handle_sigint(signum, frame):
     sys.exit(0)
 
 def handle_sigusr1(signum, frame):
-    """Handle SIGUSR1 signal for memory optimization"""
+    """Handle SIGUSR1 signal for memory optimization and an immediate memory sample"""
     logger.warning("Received SIGUSR1 - performing memory optimization")
     gc.collect()  # Force garbage collection
     
     # Log memory stats
     try:
-        import psutil
-        process = psutil.Process(os.getpid())
-        memory_info = process.memory_info()
-        logger.info(f"Memory usage after collection: {memory_info.rss / (1024*1024):.2f} MB")
-    except (ImportError, Exception) as e:
+        logger.info(f"Memory usage after collection: {current_rss_bytes() / (1024*1024):.2f} MB")
+    except Exception as e:
         logger.error(f"Error getting memory stats: {e}")
+    
+    # Run the memory monitor now instead of waiting for its next interval
+    schedule_memory_monitor(0)
 
 def handle_sigusr2(signum, frame):
     """Handle SIGUSR2 signal for stats reporting"""
@@ -85,8 +90,9 @@ def handle_sigusr2(signum, frame):
     
     # Report on memory
     try:
-        import psutil
-        process = psutil.Process(os.getpid())
+        if PROCESS is None:
+            raise ImportError("psutil not installed")
+        process = PROCESS
         memory_info = process.memory_info()
         logger.info(f"Memory usage: {memory_info.rss / (1024*1024):.2f} MB")
         logger.info(f"Open files: {len(process.open_files())}")
@@ -101,62 +107,107 @@ signal.signal(signal.SIGINT, handle_sigint)
 signal.signal(signal.SIGUSR1, handle_sigusr1)
 signal.signal(signal.SIGUSR2, handle_sigusr2)
 
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def _memory_limit_bytes():
+    """Return the memory available to this process: the cgroup limit if one is set, else physical memory"""
+    try:
+        limit = PAGE_SIZE * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError):
+        limit = 0
+    
+    # cgroup v2, then v1; an unlimited v1 group reports a huge value, which min() ignores
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limit = min(limit, int(value)) if limit else int(value)
+        break
+    return limit
+
+# Memory the thresholds are measured against, read once at startup
+MEMORY_LIMIT_BYTES = _memory_limit_bytes()
+
+def current_rss_bytes():
+    """Return the current resident set size, from a single read of /proc/self/statm"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        if PROCESS is None:
+            raise
+        return PROCESS.memory_info().rss
+
+# Pending memory monitor run on the eventlet hub
+_memory_monitor_timer = None
+
+def schedule_memory_monitor(delay):
+    """Schedule the next memory sample, replacing any pending one"""
+    global _memory_monitor_timer
+    if _memory_monitor_timer is not None:
+        _memory_monitor_timer.cancel()  # No effect once it has started running
+    _memory_monitor_timer = eventlet.spawn_after(delay, monitor_once)
+
 # Periodic memory monitor function
-def monitor_memory():
-    """Monitor memory usage and take action if needed"""
+def monitor_once():
+    """Sample memory usage once and take action if needed
+
+    Compares the current RSS (one read of /proc/self/statm) with the memory
+    limit of the container, or physical memory outside one. Reschedules
+    itself on the eventlet hub, so no thread sits idle between checks;
+    SIGUSR1 runs it immediately.
+    """
+    interval = MEMORY_CHECK_INTERVAL
     try:
-        import psutil
-        while True:
-            try:
-                # Check system memory
-                memory = psutil.virtual_memory()
-                process = psutil.Process(os.getpid())
+        rss = current_rss_bytes()
+        rss_mb = rss / (1024*1024)
+        rss_percent = (rss * 100.0 / MEMORY_LIMIT_BYTES) if MEMORY_LIMIT_BYTES else 0
+        logger.debug(f"RSS: {rss_mb:.2f} MB ({rss_percent:.1f}%), GC stats: {gc.get_stats()}")
+        
+        if rss_percent > MEMORY_WARNING_THRESHOLD:
+            # Log memory usage
+            if rss_percent > MEMORY_CRITICAL_THRESHOLD:
+                logger.critical(f"CRITICAL MEMORY ALERT: {rss_percent:.1f}% used!")
+                logger.critical(f"Process using {rss_mb:.2f} MB")
+                
+                # Run aggressive garbage collection
+                logger.info("Running aggressive garbage collection")
+                gc.collect()
+                
+                # Clear caches to free memory
+                try:
+                    from flask_server import response_cache
+                    cache_size = len(response_cache)
+                    response_cache.clear()
+                    logger.info(f"Cleared {cache_size} cache entries")
+                except (ImportError, Exception):
+                    pass
                 
-                # Log memory usage
-                if memory.percent > MEMORY_CRITICAL_THRESHOLD:
-                    logger.critical(f"CRITICAL MEMORY ALERT: {memory.percent:.1f}% used!")
-                    logger.critical(f"Process using {process.memory_info().rss / (1024*1024):.2f} MB")
-                    
-                    # Run aggressive garbage collection
-                    logger.info("Running aggressive garbage collection")
-                    gc.collect()
-                    
-                    # Clear caches to free memory
-                    try:
-                        from flask_server import response_cache
-                        cache_size = len(response_cache)
-                        response_cache.clear()
-                        logger.info(f"Cleared {cache_size} cache entries")
-                    except (ImportError, Exception):
-                        pass
-                    
-                elif memory.percent > MEMORY_WARNING_THRESHOLD:
-                    logger.warning(f"Memory usage high: {memory.percent:.1f}% used")
-                    logger.warning(f"Process using {process.memory_info().rss / (1024*1024):.2f} MB")
-                    
-                    # Run normal garbage collection
-                    gc.collect()
+            else:
+                logger.warning(f"Memory usage high: {rss_percent:.1f}% used")
+                logger.warning(f"Process using {rss_mb:.2f} MB")
                 
-                # Sleep interval (check more frequently if memory pressure is high)
-                if memory.percent > MEMORY_WARNING_THRESHOLD:
-                    time.sleep(MEMORY_CHECK_INTERVAL / 2)
-                else:
-                    time.sleep(MEMORY_CHECK_INTERVAL)
-                    
-            except Exception as e:
-                logger.error(f"Error in memory monitoring loop: {e}")
-                time.sleep(MEMORY_CHECK_INTERVAL)
+                # Run normal garbage collection
+                gc.collect()
+            
+            # Check more frequently if memory pressure is high
+            interval = MEMORY_CHECK_INTERVAL / 2
                 
-    except ImportError:
-        logger.warning("psutil not installed - memory monitoring disabled")
+    except Exception as e:
+        logger.error(f"Error in memory monitoring: {e}")
+    
+    # Schedule the next sample on the eventlet hub
+    schedule_memory_monitor(interval)
 
 def run_server():
     """Run the Flask app with Socket.IO support"""
-    # Start memory monitoring in a separate thread
+    # Schedule memory monitoring as a green thread on the eventlet hub
     try:
-        memory_thread = Thread(target=monitor_memory, daemon=True)
-        memory_thread.start()
-        logger.info("Started memory monitoring thread")
+        schedule_memory_monitor(MEMORY_CHECK_INTERVAL)
+        logger.info("Scheduled memory monitoring")
     except Exception as e:
         logger.error(f"Error starting memory monitoring: {e}")
     
@@ -4,12 +4,16 @@ Main entry point for the Enhanced iOS Terminal Server
 Uses the redesigned terminal emulation with integrated file operations
 """
 
+# Patch the standard library for gevent before anything else is imported
+import gevent
+from gevent import monkey
+monkey.patch_all()
+
 import os
 import sys
+import atexit
 import signal
 import logging
-import eventlet
-import threading
 import time
 import gc
 
@@ -27,10 +31,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger("run_enhanced")
 
-# Set eventlet as the async mode before importing Flask-SocketIO components
-os.environ['EVENTLET_NO_GREENDNS'] = '1'  # Avoid DNS resolution issues
-eventlet.monkey_patch()
-
 # Define signal handlers for graceful shutdown
 def handle_sigterm(signum, frame):
     """Handle SIGTERM signal for graceful shutdown"""
@@ -69,24 +69,33 @@ def monitor_memory():
         MEMORY_WARNING_THRESHOLD = 75  # percent
         MEMORY_CRITICAL_THRESHOLD = 90  # percent
         MEMORY_CHECK_INTERVAL = 60  # seconds
+        GC_COOLDOWN = 120  # seconds between forced collections
+        
+        # Constructing a Process re-reads /proc, so build it once
+        process = psutil.Process(os.getpid())
+        last_collect_ts = 0
         
         while True:
             try:
                 # Check system memory
                 memory = psutil.virtual_memory()
-                process = psutil.Process(os.getpid())
                 
                 # Log memory usage
                 logger.info(f"Memory usage: {memory.percent:.1f}% (Process: {process.memory_info().rss / (1024*1024):.2f} MB)")
                 
                 if memory.percent > MEMORY_CRITICAL_THRESHOLD:
                     logger.critical(f"CRITICAL MEMORY ALERT: {memory.percent:.1f}% used!")
-                    logger.info("Running aggressive garbage collection")
-                    gc.collect()
+                    
+                    # Only force a full collection under sustained pressure
+                    now = time.time()
+                    if now - last_collect_ts > GC_COOLDOWN:
+                        logger.info("Running aggressive garbage collection")
+                        gc.collect()
+                        last_collect_ts = now
                     
                 elif memory.percent > MEMORY_WARNING_THRESHOLD:
                     logger.warning(f"Memory usage high: {memory.percent:.1f}% used")
-                    gc.collect()
+                    logger.warning(f"GC stats: {gc.get_stats()}")
                 
                 # Sleep interval
                 time.sleep(MEMORY_CHECK_INTERVAL)
@@ -100,11 +109,15 @@ def monitor_memory():
 
 def run_server():
     """Run the Flask app with Socket.IO support"""
-    # Start memory monitoring in a separate thread
+    # Raise the generation-0 threshold so routine allocation churn
+    # triggers far fewer collections
+    gc.set_threshold(700 * 16, 10, 10)
+    
+    # Start memory monitoring as a greenlet on the gevent hub; time.sleep
+    # is monkey-patched, so the loop yields between checks
     try:
-        memory_thread = threading.Thread(target=monitor_memory, daemon=True)
-        memory_thread.start()
-        logger.info("Started memory monitoring thread")
+        gevent.spawn(monitor_memory)
+        logger.info("Started memory monitoring greenlet")
     except Exception as e:
         logger.error(f"Error starting memory monitoring: {e}")
     
@@ -114,7 +127,11 @@ def run_server():
     
     try:
         # Import the enhanced server module
-        from enhanced_flask_server import app, socketio
+        from enhanced_flask_server import app, socketio, session_manager
+        
+        # Compact the session journal on shutdown so access times are persisted
+        # (SIGTERM/SIGINT exit through sys.exit, which runs atexit handlers)
+        atexit.register(session_manager.flush, force=True)
         
         # Get port from environment or use default
         port = int(os.environ.get('PORT', 3000))
@@ -127,6 +144,14 @@ def run_server():
         logger.info(f"Debug mode: {debug}")
         logger.info(f"WebSocket mode: {socketio.async_mode}")
         
+        # Everything built so far (modules, app, routes, restored sessions) lives
+        # for the whole process. Move it to the permanent generation so full
+        # collections stop rescanning it; objects created later are still
+        # collected normally.
+        gc.collect()
+        gc.collect()
+        gc.freeze()
+        
         # Start the socketio server
         socketio.run(
             app,
@@ -144,9 +169,4 @@ def run_server():
         sys.exit(1)
 
 if __name__ == "__main__":
-    # Set up thread debugging for eventlet if in debug mode
-    if os.environ.get('DEBUG', 'False').lower() == 'true':
-        eventlet.debug.hub_prevent_multiple_readers(False)
-        eventlet.debug.hub_exceptions(True)
-    
     run_server()
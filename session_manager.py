@@ -6,16 +6,40 @@ isolation and persistence.
 """
 
 import os
+import heapq
+import queue
 import threading
 import time
 import uuid
+from types import MappingProxyType
 import json
 import shutil
 import logging
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj):
+    """Serialize an object to JSON bytes, using orjson when available"""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode('utf-8')
+
+
+def _loads(data):
+    """Parse JSON bytes, using orjson when available"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
 logger = logging.getLogger("session_manager")
 
+# Number of independently locked session shards (must be a power of two)
+SHARD_COUNT = 16
+
+# Minimum seconds between journaled access-time updates of one session
+TOUCH_JOURNAL_INTERVAL = 60
+
 class SessionManager:
     """
     Manages terminal sessions, providing isolation and persistence.
@@ -25,31 +49,66 @@ class SessionManager:
     - Managing session file systems
     - Session cleanup and expiration
     - User mapping to sessions
+    
+    Sessions are split across SHARD_COUNT shards, each with its own writer
+    lock, so writes to unrelated sessions never contend. Shards are
+    copy-on-write: a writer builds a new dict and rebinds the shard, which is
+    atomic under the GIL, so readers look sessions up without any lock. The
+    user mapping and the expiry heap have separate small locks. The only
+    nesting is the user lock taken inside the save lock while writing a
+    snapshot, so the user lock must never be held when taking the save lock.
+    
+    Sessions are persisted as a snapshot (sessions.json) plus an append-only
+    journal (sessions.log) of add/del/touch events. Access times are
+    journaled at most once per TOUCH_JOURNAL_INTERVAL per session, so after
+    a crash they are at most that much out of date. The journal is folded
+    back into the snapshot once it grows larger than the snapshot.
     """
     
-    def __init__(self, session_timeout=3600, user_data_dir="user_data"):
+    def __init__(self, session_timeout=3600, user_data_dir="user_data", save_interval=5):
         """
         Initialize the session manager.
         
         Args:
             session_timeout: Session timeout in seconds (default: 1 hour)
             user_data_dir: Base directory for user session data
+            save_interval: Seconds between checks for journal compaction
         """
-        self.sessions = {}
+        self._shards = [{} for _ in range(SHARD_COUNT)]
+        self._shard_locks = [threading.Lock() for _ in range(SHARD_COUNT)]
         self.user_sessions = {}  # Map user_id to session_id
-        self.session_lock = threading.Lock()
+        self.user_lock = threading.Lock()
+        self.expiry_lock = threading.Lock()
+        self.save_lock = threading.Lock()  # Serializes writes of the snapshot and journal
         self.session_timeout = session_timeout
         self.user_data_dir = user_data_dir
+        self.save_interval = save_interval
+        self.sessions_file = os.path.join(user_data_dir, 'sessions.json')
+        self.journal_path = os.path.join(user_data_dir, 'sessions.log')
+        # Min-heap of (expiry time, session_id); entries are re-checked when popped
+        self._expiry_heap = []
+        # Renamed home directories waiting to be deleted by the removal thread
+        self._gc_queue = queue.Queue()
         
         # Create user data directory if it doesn't exist
         os.makedirs(user_data_dir, exist_ok=True)
         
+        # Load any saved sessions
+        self._load_sessions()
+        
+        # Open the journal once; unbuffered so each event is a single write
+        self.journal_file = open(self.journal_path, 'ab', buffering=0)
+        
         # Start cleanup thread
         self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
         self.cleanup_thread.start()
         
-        # Load any saved sessions
-        self._load_sessions()
+        # Start directory removal thread, picking up removals left by a previous run
+        self.gc_thread = threading.Thread(target=self._gc_loop, daemon=True)
+        self.gc_thread.start()
+        for entry in os.scandir(user_data_dir):
+            if '.deleted.' in entry.name and entry.is_dir():
+                self._gc_queue.put(entry.path)
         
         logger.info(f"Session manager initialized with timeout: {session_timeout}s")
     
@@ -64,37 +123,46 @@ class SessionManager:
         Returns:
             Dict containing session information
         """
-        session_id = str(uuid.uuid4())
+        session_id = uuid.uuid4().hex
         home_dir = os.path.join(self.user_data_dir, session_id)
         
         # Set up the user environment with necessary files
         try:
-            # Create the directory if it doesn't exist
-            os.makedirs(home_dir, exist_ok=True)
+            # The home directory and environment files are created on first
+            # use (see ensure_home) to improve session creation speed
+            session = {
+                'user_id': user_id,
+                'client_ip': client_ip,
+                'created': time.time(),  # Wall clock, for reporting
+                'last_accessed': time.monotonic(),
+                'home_dir': home_dir,
+                'home_real': os.path.realpath(home_dir),  # For path security checks
+                'home_dir_ready': False
+            }
+            session['_access_journaled'] = session['last_accessed']  # Recorded by the 'add' event
+            session['_view'] = MappingProxyType(session)
             
-            # Set up environment files (this will be done when needed)
-            # We'll delay this until the first command to improve session creation speed
+            index = self._shard_index(session_id)
+            with self._shard_locks[index]:
+                shard = dict(self._shards[index])
+                shard[session_id] = session
+                self._shards[index] = shard
             
-            with self.session_lock:
-                self.sessions[session_id] = {
-                    'user_id': user_id,
-                    'client_ip': client_ip,
-                    'created': time.time(),
-                    'last_accessed': time.time(),
-                    'home_dir': home_dir
-                }
-                
-                # Map user_id to this session
+            # Map user_id to this session
+            with self.user_lock:
                 self.user_sessions[user_id] = session_id
-                
-                # Save sessions to disk
-                self._save_sessions()
+            
+            with self.expiry_lock:
+                heapq.heappush(self._expiry_heap, (session['last_accessed'] + self.session_timeout, session_id))
+            
+            # Record the new session in the journal
+            self._journal('add', session_id, session)
             
             logger.info(f"Created session {session_id} for user {user_id}")
             
             return {
                 'sessionId': session_id,
-                'created': datetime.fromtimestamp(time.time()).isoformat(),
+                'created': datetime.fromtimestamp(session['created']).isoformat(),
                 'expiresIn': self.session_timeout,
                 'workingDirectory': '~'
             }
@@ -119,24 +187,52 @@ class SessionManager:
             session_id: The session ID to retrieve
             
         Returns:
-            Dict containing session data or None if invalid/expired
+            Read-only mapping of the session data or None if invalid/expired
         """
-        with self.session_lock:
-            if session_id not in self.sessions:
-                return None
-            
-            # Check if session has expired
-            current_time = time.time()
-            session = self.sessions[session_id]
-            if current_time - session['last_accessed'] > self.session_timeout:
-                # Session expired
-                self._remove_session(session_id)
-                return None
-            
-            # Update last accessed time
-            session['last_accessed'] = current_time
+        # Lock-free read of the current copy-on-write shard
+        session = self._shards[self._shard_index(session_id)].get(session_id)
+        if session is None:
+            return None
+        
+        # Check if session has expired
+        current_time = time.monotonic()
+        if current_time - session['last_accessed'] > self.session_timeout:
+            # Session expired
+            if self._remove_session(session_id) is not None:
+                self._journal('del', session_id)
+            return None
+        
+        # Update last accessed time (a single item assignment is atomic)
+        self._touch(session_id, session, current_time)
+        
+        return session['_view']  # Read-only view, callers must not modify the session
+    
+    def ensure_home(self, session_id):
+        """
+        Create a session's home directory on first use.
+        
+        Args:
+            session_id: The session ID
             
-            return session.copy()  # Return a copy to prevent external modification
+        Returns:
+            The home directory path or None if the session does not exist
+        """
+        session = self._shards[self._shard_index(session_id)].get(session_id)
+        if session is None:
+            return None
+        
+        home_dir = session['home_dir']
+        if not session.get('home_dir_ready'):
+            try:
+                # user_data_dir is created at startup, so one mkdir is enough
+                os.mkdir(home_dir)
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                os.makedirs(home_dir, exist_ok=True)
+            session['home_dir_ready'] = True
+        
+        return home_dir
     
     def end_session(self, session_id, preserve_data=False):
         """
@@ -149,165 +245,380 @@ class SessionManager:
         Returns:
             Boolean indicating success
         """
-        with self.session_lock:
-            if session_id not in self.sessions:
-                return False
-            
-            # Get the session data
-            session = self.sessions[session_id]
-            user_id = session.get('user_id')
-            home_dir = session.get('home_dir')
-            
-            # Remove session
-            self._remove_session(session_id)
-            
-            # Remove user-session mapping
-            if user_id and user_id in self.user_sessions:
-                if self.user_sessions[user_id] == session_id:
-                    del self.user_sessions[user_id]
-            
-            # Clean up data unless preservation is requested
-            if not preserve_data and home_dir and os.path.exists(home_dir):
-                try:
-                    shutil.rmtree(home_dir)
-                    logger.info(f"Removed session directory: {home_dir}")
-                except Exception as e:
-                    logger.error(f"Error removing session directory: {str(e)}")
-            
-            # Save sessions to disk
-            self._save_sessions()
-            
-            logger.info(f"Ended session {session_id}")
-            
-            return True
+        # Remove session and its user-session mapping
+        session = self._remove_session(session_id)
+        if session is None:
+            return False
+        
+        home_dir = session.get('home_dir')
+        
+        # Clean up data unless preservation is requested
+        if not preserve_data and home_dir:
+            self._discard_home(home_dir)
+        
+        # Record the removal in the journal
+        self._journal('del', session_id)
+        
+        logger.info(f"Ended session {session_id}")
+        
+        return True
     
     def update_session_access(self, session_id):
         """Update the last accessed time for a session"""
-        with self.session_lock:
-            if session_id in self.sessions:
-                self.sessions[session_id]['last_accessed'] = time.time()
-                return True
+        session = self._shards[self._shard_index(session_id)].get(session_id)
+        if session is not None:
+            self._touch(session_id, session, time.monotonic())
+            return True
         return False
     
     def get_all_sessions(self):
         """Get all active sessions (for admin purposes)"""
-        with self.session_lock:
-            return {sid: session.copy() for sid, session in self.sessions.items()}
+        return {
+            sid: {key: value for key, value in session.items() if not key.startswith('_')}
+            for shard in self._shards
+            for sid, session in shard.items()
+        }
+    
+    def _touch(self, session_id, session, now):
+        """Set a session's last access time, journaling it if the last journaled one is stale"""
+        session['last_accessed'] = now
+        if now - session['_access_journaled'] >= TOUCH_JOURNAL_INTERVAL:
+            session['_access_journaled'] = now
+            self._journal('touch', session_id, last_accessed=now + self._wall_clock_offset())
+    
+    @staticmethod
+    def _shard_index(session_id):
+        """Return the index of the shard holding a session"""
+        return hash(session_id) & (SHARD_COUNT - 1)
     
     def _remove_session(self, session_id):
-        """Internal method to remove a session"""
-        if session_id in self.sessions:
-            # Remove user mapping if exists
-            user_id = self.sessions[session_id].get('user_id')
-            if user_id and user_id in self.user_sessions and self.user_sessions[user_id] == session_id:
-                del self.user_sessions[user_id]
-            
-            # Remove session
-            del self.sessions[session_id]
-            
-            logger.info(f"Removed session {session_id}")
-            return True
-        return False
+        """
+        Internal method to remove a session and its user mapping.
+        
+        Returns:
+            The removed session dict, or None if it did not exist
+        """
+        index = self._shard_index(session_id)
+        with self._shard_locks[index]:
+            if session_id not in self._shards[index]:
+                return None
+            shard = dict(self._shards[index])
+            session = shard.pop(session_id)
+            self._shards[index] = shard
+        
+        # Remove user mapping if exists
+        user_id = session.get('user_id')
+        if user_id:
+            with self.user_lock:
+                if self.user_sessions.get(user_id) == session_id:
+                    del self.user_sessions[user_id]
+        
+        logger.info(f"Removed session {session_id}")
+        return session
+    
+    def flush(self, force=False):
+        """
+        Compact the journal into the snapshot once it outgrows the snapshot.
+        
+        Args:
+            force: Compact regardless of size, e.g. to persist access times on shutdown
+        """
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+            snapshot_size = os.path.getsize(self.sessions_file) if os.path.exists(self.sessions_file) else 0
+        except OSError as e:
+            logger.error(f"Error checking session journal size: {str(e)}")
+            return
+        
+        if force or journal_size > snapshot_size:
+            self._save_sessions()
     
     def _cleanup_loop(self):
-        """Background thread to clean up expired sessions"""
+        """Background thread to clean up expired sessions and compact the journal"""
+        last_cleanup = float('-inf')
         while True:
             try:
-                self._cleanup_expired_sessions()
+                now = time.monotonic()
+                if now - last_cleanup >= 60:  # Check every minute
+                    last_cleanup = now
+                    self._cleanup_expired_sessions()
+                
+                # Fold the journal into the snapshot when it has grown too large
+                self.flush()
             except Exception as e:
                 logger.error(f"Error in session cleanup: {str(e)}")
             
-            # Sleep for a while before next cleanup
-            time.sleep(60)  # Check every minute
+            # Sleep for a while before next pass
+            time.sleep(self.save_interval)
+    
+    def _discard_home(self, home_dir):
+        """
+        Move a session directory out of the way and queue it for deletion.
+        
+        The rename is atomic and cheap, so callers never wait on rmtree.
+        """
+        trash_dir = f"{home_dir}.deleted.{uuid.uuid4().hex}"
+        try:
+            os.rename(home_dir, trash_dir)
+        except FileNotFoundError:
+            return  # Directory was never created
+        except Exception as e:
+            logger.error(f"Error removing session directory: {str(e)}")
+            return
+        
+        self._gc_queue.put(trash_dir)
+    
+    def _gc_loop(self):
+        """Background thread that deletes discarded session directories"""
+        while True:
+            path = self._gc_queue.get()
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed session directory: {path}")
     
     def _cleanup_expired_sessions(self):
-        """Clean up expired sessions"""
-        current_time = time.time()
+        """
+        Clean up expired sessions.
+        
+        Only sessions at the top of the expiry heap are inspected. An entry
+        whose session was accessed since it was pushed is re-pushed with its
+        current expiry time instead of being removed.
+        """
+        current_time = time.monotonic()  # One clock read for the whole pass
         expired_sessions = []
         
-        with self.session_lock:
-            for session_id, session in self.sessions.items():
-                # Check if session has expired
-                if current_time - session['last_accessed'] > self.session_timeout:
-                    expired_sessions.append(session_id)
+        # Take the candidates whose recorded expiry has passed
+        candidates = []
+        with self.expiry_lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] < current_time:
+                candidates.append(heapq.heappop(heap)[1])
+        
+        still_active = []
+        for session_id in candidates:
+            session = self._shards[self._shard_index(session_id)].get(session_id)
+            if session is None:
+                continue  # Session already ended
             
-            # Remove expired sessions
-            for session_id in expired_sessions:
-                home_dir = self.sessions[session_id].get('home_dir')
-                self._remove_session(session_id)
-                
-                # Clean up session directory
-                if home_dir and os.path.exists(home_dir):
-                    try:
-                        shutil.rmtree(home_dir)
-                        logger.info(f"Cleaned up expired session directory: {home_dir}")
-                    except Exception as e:
-                        logger.error(f"Error removing expired session directory: {str(e)}")
+            # Check if session has expired
+            expires_at = session['last_accessed'] + self.session_timeout
+            if expires_at >= current_time:
+                still_active.append((expires_at, session_id))
+                continue
+            
+            session = self._remove_session(session_id)
+            if session is None:
+                continue
+            expired_sessions.append(session_id)
+            
+            # Clean up session directory
+            home_dir = session.get('home_dir')
+            if home_dir:
+                self._discard_home(home_dir)
+        
+        if still_active:
+            with self.expiry_lock:
+                for entry in still_active:
+                    heapq.heappush(self._expiry_heap, entry)
         
         if expired_sessions:
             logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
-            self._save_sessions()
+            for session_id in expired_sessions:
+                self._journal('del', session_id)
+    
+    @staticmethod
+    def _wall_clock_offset():
+        """Return the offset that converts time.monotonic() values to wall clock time"""
+        return time.time() - time.monotonic()
+    
+    @staticmethod
+    def _session_record(session, wall_offset):
+        """
+        Return the minimal persisted form of a session.
+        
+        last_accessed is kept on the monotonic clock in memory and converted
+        to wall clock time here, since monotonic values do not survive a restart.
+        """
+        return {
+            'user_id': session.get('user_id'),
+            'client_ip': session.get('client_ip'),
+            'created': session.get('created'),
+            'last_accessed': session.get('last_accessed') + wall_offset,
+            'home_dir': session.get('home_dir'),
+            'home_dir_ready': session.get('home_dir_ready', True)
+        }
+    
+    def _journal(self, op, session_id, session=None, last_accessed=None):
+        """
+        Append a session event to the journal.
+        
+        Args:
+            op: 'add', 'del' or 'touch'
+            session_id: The session the event applies to
+            session: The session data, for 'add' events
+            last_accessed: The wall clock access time, for 'touch' events
+        """
+        record = {'op': op, 'id': session_id}
+        if session is not None:
+            record['session'] = self._session_record(session, self._wall_clock_offset())
+        if last_accessed is not None:
+            record['last_accessed'] = last_accessed
+        
+        try:
+            with self.save_lock:
+                self.journal_file.write(_dumps(record) + b'\n')
+        except Exception as e:
+            logger.error(f"Error writing session journal: {str(e)}")
+    
+    @staticmethod
+    def _apply_journal_record(sessions, user_sessions, record):
+        """Replay a single journal event onto the given session maps"""
+        session_id = record.get('id')
+        if record.get('op') == 'add':
+            session = record.get('session', {})
+            sessions[session_id] = session
+            if session.get('user_id'):
+                user_sessions[session['user_id']] = session_id
+        elif record.get('op') == 'del':
+            session = sessions.pop(session_id, None)
+            user_id = session.get('user_id') if session else None
+            if user_id and user_sessions.get(user_id) == session_id:
+                del user_sessions[user_id]
+        elif record.get('op') == 'touch':
+            session = sessions.get(session_id)
+            if session is not None and 'last_accessed' in record:
+                session['last_accessed'] = record['last_accessed']
     
     def _save_sessions(self):
-        """Save active sessions to disk for persistence"""
+        """
+        Write a snapshot of active sessions and truncate the journal.
+        
+        The sessions are read from the current copy-on-write shards without
+        locking and written to a temporary file that atomically replaces
+        the previous snapshot. Journal appends wait on the save lock
+        meanwhile, so no event is lost between the snapshot and the
+        truncation; replaying an event already in the snapshot is harmless.
+        Must not be called while holding the user lock.
+        """
         try:
-            sessions_file = os.path.join(self.user_data_dir, 'sessions.json')
-            
-            # Only save the minimal required data, not the complete session objects
-            serializable_sessions = {}
-            for session_id, session in self.sessions.items():
-                serializable_sessions[session_id] = {
-                    'user_id': session.get('user_id'),
-                    'client_ip': session.get('client_ip'),
-                    'created': session.get('created'),
-                    'last_accessed': session.get('last_accessed'),
-                    'home_dir': session.get('home_dir')
+            with self.save_lock:
+                # Only save the minimal required data, not the complete session objects
+                wall_offset = self._wall_clock_offset()
+                serializable_sessions = {
+                    session_id: self._session_record(session, wall_offset)
+                    for shard in self._shards
+                    for session_id, session in shard.items()
                 }
-            
-            with open(sessions_file, 'w') as f:
-                json.dump({
+                with self.user_lock:
+                    user_sessions = dict(self.user_sessions)
+                
+                data = _dumps({
                     'sessions': serializable_sessions,
-                    'user_sessions': self.user_sessions,
+                    'user_sessions': user_sessions,
                     'timestamp': time.time()
-                }, f)
+                })
+                
+                tmp_file = self.sessions_file + '.tmp'
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_file, self.sessions_file)
+                
+                # Everything in the journal is now in the snapshot
+                self.journal_file.truncate(0)
                 
-            logger.debug(f"Saved {len(self.sessions)} sessions to disk")
+            logger.debug(f"Saved {len(serializable_sessions)} sessions to disk")
         except Exception as e:
             logger.error(f"Error saving sessions to disk: {str(e)}")
     
     def _load_sessions(self):
-        """Load sessions from disk"""
+        """Load the session snapshot from disk and replay the journal over it"""
         try:
-            sessions_file = os.path.join(self.user_data_dir, 'sessions.json')
+            sessions = {}
+            user_sessions = {}
             
-            if not os.path.exists(sessions_file):
-                logger.info("No saved sessions found")
-                return
+            if os.path.exists(self.sessions_file):
+                with open(self.sessions_file, 'rb') as f:
+                    data = _loads(f.read())
+                sessions = data.get('sessions', {})
+                user_sessions = data.get('user_sessions', {})
+            
+            replayed = 0
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'rb') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            record = _loads(line)
+                        except ValueError:
+                            # A torn final line from a crash mid-write
+                            logger.warning("Skipping unreadable session journal entry")
+                            continue
+                        self._apply_journal_record(sessions, user_sessions, record)
+                        replayed += 1
             
-            with open(sessions_file, 'r') as f:
-                data = json.load(f)
+            if not sessions and not replayed:
+                logger.info("No saved sessions found")
             
-            with self.session_lock:
-                self.sessions = data.get('sessions', {})
-                self.user_sessions = data.get('user_sessions', {})
+            # Verify session directories exist; sessions that never used
+            # their home directory have not created it yet. One scandir of
+            # the data directory replaces a stat per session.
+            data_dir = os.path.normpath(self.user_data_dir)
+            with os.scandir(data_dir) as entries:
+                existing = {entry.name for entry in entries if entry.is_dir()}
             
-            # Verify session directories exist
             valid_sessions = {}
-            for session_id, session in self.sessions.items():
+            for session_id, session in sessions.items():
                 home_dir = session.get('home_dir')
-                if home_dir and os.path.exists(home_dir):
+                if not home_dir:
+                    found = False
+                elif not session.get('home_dir_ready', True):
+                    found = True
+                elif os.path.dirname(home_dir) == data_dir:
+                    found = os.path.basename(home_dir) in existing
+                else:
+                    found = os.path.exists(home_dir)  # Stored outside the data directory
+                
+                if found:
                     valid_sessions[session_id] = session
                 else:
                     logger.warning(f"Session {session_id} directory not found, skipping")
             
             # Update sessions with valid ones only
-            with self.session_lock:
-                self.sessions = valid_sessions
+            self._set_sessions(valid_sessions, user_sessions)
             
-            logger.info(f"Loaded {len(self.sessions)} valid sessions from disk")
+            logger.info(f"Loaded {len(valid_sessions)} valid sessions from disk ({replayed} journal entries replayed)")
         except Exception as e:
             logger.error(f"Error loading sessions from disk: {str(e)}")
             # Start with empty sessions if load fails
-            with self.session_lock:
-                self.sessions = {}
-                self.user_sessions = {}
+            self._set_sessions({}, {})
+    
+    def _set_sessions(self, sessions, user_sessions):
+        """
+        Replace all sessions, distributing them across the shards.
+        
+        The sessions are in persisted form; last_accessed is converted from
+        wall clock time back to the monotonic clock.
+        """
+        wall_offset = self._wall_clock_offset()
+        shards = [{} for _ in range(SHARD_COUNT)]
+        for session_id, session in sessions.items():
+            session['last_accessed'] -= wall_offset
+            session['_access_journaled'] = session['last_accessed']  # As persisted
+            session['home_real'] = os.path.realpath(session['home_dir'])
+            session['_view'] = MappingProxyType(session)
+            shards[self._shard_index(session_id)][session_id] = session
+        
+        for index in range(SHARD_COUNT):
+            with self._shard_locks[index]:
+                self._shards[index] = shards[index]
+        
+        with self.user_lock:
+            self.user_sessions = user_sessions
+        
+        expiry_heap = [
+            (session['last_accessed'] + self.session_timeout, session_id)
+            for session_id, session in sessions.items()
+        ]
+        heapq.heapify(expiry_heap)
+        with self.expiry_lock:
+            self._expiry_heap = expiry_heap
@@ -9,12 +9,19 @@ rather than exposing them as separate HTTP endpoints.
 import os
 import subprocess
 import shutil
+import stat
 import threading
 import signal
 import time
 import logging
-import select
+import weakref
+import selectors
 import re
+import shlex
+import getopt
+import codecs
+import io
+from collections import OrderedDict, deque
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from openssl_improved import handle_openssl_command, setup_openssl_environment
@@ -22,6 +29,46 @@ from openssl_improved import handle_openssl_command, setup_openssl_environment
 # Create a logger
 logger = logging.getLogger("terminal_command_handler")
 
+# Size of the buffers used to read command output, and how many are kept for reuse
+READ_BUFFER_SIZE = 4096
+READ_BUFFER_POOL_SIZE = 64
+
+# Text buffers kept for reuse by the file handlers, and the largest size worth keeping
+TEXT_BUFFER_POOL_SIZE = 16
+TEXT_BUFFER_MAX_SIZE = 64 * 1024
+
+# Number of sessions whose command environment is kept
+ENV_CACHE_SIZE = 1024
+
+# Chunk size used when streaming file contents to a callback
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Commands with a built-in handler, matched on the command name followed by an argument
+_FILE_OP_RE = re.compile(r'(cat|more|less|echo|mkdir|rm|touch|grep|find)\s')
+
+# Shell control and redirection operators; commands using them are left to the shell
+_SHELL_OPERATORS = frozenset(['|', '||', '&', '&&', ';', ';;', '<', '<<', '>', '>>', '>&', '<&', '>|'])
+
+# Stateful UTF-8 decoder for output that arrives in chunks
+_utf8_decoder = codecs.getincrementaldecoder('utf-8')
+
+
+def _split_command(command):
+    """Split a command into shell words, keeping operators such as > and | as separate tokens"""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars='|&;<>')
+    lexer.whitespace_split = True
+    return list(lexer)
+
+
+class _ProcessEntry:
+    """A running command tracked for a session"""
+    __slots__ = ('process', 'start_time', '__weakref__')
+    
+    def __init__(self, process):
+        self.process = process
+        self.start_time = time.time()
+
+
 class TerminalCommandHandler:
     """
     Handles terminal commands with integrated file operations.
@@ -29,9 +76,48 @@ class TerminalCommandHandler:
     """
     
     def __init__(self):
-        # Keep track of running processes
-        self.processes = {}
-        self.process_lock = threading.Lock()
+        # Keep track of running processes. Whoever drives a command (the
+        # reactor or the HTTP request) holds its entry, so finished commands
+        # drop out without explicit cleanup or a lock.
+        self.processes = weakref.WeakValueDictionary()
+        
+        # Per-session command environments, least recently used first
+        self._env_cache = OrderedDict()
+        self._env_lock = threading.Lock()
+        
+        # Free list of output read buffers used by the reactor
+        self._read_buffers = deque()
+        
+        # Free list of text buffers for the mkdir/rm/touch result messages
+        self._text_buffers = deque()
+        
+        # Output of streaming commands is forwarded by one reactor thread;
+        # DefaultSelector is epoll on Linux (and gevent's selector when patched)
+        self._selector = selectors.DefaultSelector()
+        self._reactor_lock = threading.Lock()
+        self._reactor_thread = None
+        self._exiting = []  # Streams at EOF whose process is to be reaped
+        
+        # Written to after registering new pipes, so the reactor picks them up
+        # straight away; a selector blocked in another greenlet under gevent
+        # does not see registrations made while it waits
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+        
+        # Built-in file operations, dispatched on the command name
+        self._file_ops = {
+            'cat': self._cat,
+            'more': self._cat,
+            'less': self._cat,
+            'echo': self._echo,
+            'mkdir': self._mkdir,
+            'rm': self._rm,
+            'touch': self._touch,
+            'grep': self._grep,
+            'find': self._find,
+        }
         
     def execute_command(self, command, session_id, session_data, callback=None):
         """
@@ -57,80 +143,73 @@ class TerminalCommandHandler:
         if not home_dir or not os.path.isdir(home_dir):
             return {"error": f"Session directory not found: {home_dir}", "exit_code": 1}
             
+        # Symlink-free home directory used for path security checks
+        home_real = session_data.get('home_real') or os.path.realpath(home_dir)
+        
         # Check for built-in file operations first and handle them directly
-        file_op_result = self._handle_file_operations(command, home_dir, callback)
+        file_op_result = self._handle_file_operations(command, home_dir, callback, home_real)
+        custom_env = None
         if file_op_result is not None:
             # Check if we just need to modify the command and continue
             if file_op_result.get("modified_command"):
                 command = file_op_result["modified_command"]
                 # If environment variables are provided, use them
                 custom_env = file_op_result.get("env")
-                if custom_env:
-                    env = custom_env
             else:
                 # Otherwise return the result directly
                 return file_op_result
             
-        # Add environment variables to help user-level installations
-        env = os.environ.copy() if not locals().get('env') else env
-        env['HOME'] = home_dir
-        env['PYTHONUSERBASE'] = os.path.join(home_dir, '.local')
-        env['PATH'] = os.path.join(home_dir, '.local', 'bin') + ':' + env.get('PATH', '')
-        env['USER'] = 'terminal-user'  # Provide a username for commands that need it
-        env['TERM'] = 'xterm-256color'  # Standard terminal type
-        env['OPENSSL_PASSPHRASE'] = 'termux_secure_passphrase'  # Default passphrase for OpenSSL
-        
-        # Source .profile instead of just .bashrc to get all environment variables
-        profile_path = os.path.join(home_dir, '.profile')
-        if os.path.exists(profile_path):
-            source_cmd = f"source {profile_path}"
+        # Environment, built once per session
+        if custom_env:
+            env = self._build_env(custom_env, home_dir)
         else:
-            source_cmd = "source .bashrc 2>/dev/null || true"
+            env = self._get_session_env(session_id, home_dir)
         
-        # Execute command with bash to ensure profile or bashrc is sourced
-        full_command = f'cd {home_dir} && {source_cmd}; {command}'
+        # Execute command with a login bash, which sources the profile (and
+        # through it .bashrc) itself; the working directory is set by Popen
+        argv = ['bash', '--login', '-c', command]
         
         try:
-            # Start process in its own process group with stdout and stderr piped
+            # Start process in its own session (and process group) with stdout
+            # and stderr piped. Without preexec_fn, CPython can launch it with
+            # vfork/posix_spawn instead of a full fork of the server process.
             process = subprocess.Popen(
-                full_command,
-                shell=True,
+                argv,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
                 bufsize=1,  # Line buffered
                 cwd=home_dir,
                 env=env,
-                preexec_fn=os.setsid  # Create new process group
+                close_fds=True,
+                start_new_session=True
             )
             
             # Store process information
-            with self.process_lock:
-                self.processes[session_id] = {
-                    'process': process,
-                    'start_time': time.time()
-                }
-            
-            # Stream output in real-time (for WebSocket)
-            stdout_data = ""
-            stderr_data = ""
+            entry = _ProcessEntry(process)
+            self.processes[session_id] = entry
             
             if callback:
                 # Use callback for streaming (WebSocket)
-                self._stream_output_with_callback(process, session_id, callback)
+                self._stream_output_with_callback(entry, session_id, callback)
                 return {"message": "Command execution started with streaming output"}
             else:
-                # Collect output for HTTP API
-                stdout_data, stderr_data = process.communicate(timeout=60)
-                exit_code = process.poll() or 0
-                
-                # Clean up process tracking
-                with self.process_lock:
-                    if session_id in self.processes:
-                        del self.processes[session_id]
+                # Collect output for HTTP API through the reactor, which signals
+                # once both pipes are closed and the process has been reaped
+                stdout_parts = []
+                stderr_parts = []
+                done = threading.Event()
+                self._stream_output_with_callback(
+                    entry, session_id, lambda text, exit_code: done.set(),
+                    on_stdout=stdout_parts.append, on_stderr=stderr_parts.append
+                )
+                if not done.wait(timeout=60):
+                    raise subprocess.TimeoutExpired(argv, 60)
+                exit_code = process.returncode or 0
                 
                 # Combine stdout and stderr
-                output = stdout_data
+                output = ''.join(stdout_parts)
+                stderr_data = ''.join(stderr_parts)
                 if stderr_data:
                     if output:
                         output += "\n" + stderr_data
@@ -143,14 +222,13 @@ class TerminalCommandHandler:
                 }
                 
         except subprocess.TimeoutExpired:
-            with self.process_lock:
-                if session_id in self.processes:
-                    try:
-                        process = self.processes[session_id]['process']
-                        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    except Exception as e:
-                        logger.error(f"Error terminating process: {str(e)}")
-                    del self.processes[session_id]
+            # Unless terminate_process already stopped it
+            if self.processes.get(session_id) is entry:
+                del self.processes[session_id]
+                try:
+                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+                except Exception as e:
+                    logger.error(f"Error terminating process: {str(e)}")
             
             return {
                 "error": "Command execution timed out",
@@ -163,85 +241,257 @@ class TerminalCommandHandler:
                 "exit_code": 1
             }
 
-    def _stream_output_with_callback(self, process, session_id, callback):
-        """Stream process output and call the callback with each chunk"""
-        def stream_output():
+    @staticmethod
+    def _build_env(base_env, home_dir):
+        """Return a copy of base_env with the variables for a session's commands"""
+        # Add environment variables to help user-level installations
+        env = dict(base_env)
+        env['HOME'] = home_dir
+        env['PYTHONUSERBASE'] = os.path.join(home_dir, '.local')
+        env['PATH'] = os.path.join(home_dir, '.local', 'bin') + ':' + env.get('PATH', '')
+        env['USER'] = 'terminal-user'  # Provide a username for commands that need it
+        env['TERM'] = 'xterm-256color'  # Standard terminal type
+        env['OPENSSL_PASSPHRASE'] = 'termux_secure_passphrase'  # Default passphrase for OpenSSL
+        return env
+    
+    def _get_session_env(self, session_id, home_dir):
+        """
+        Get the environment for a session's commands.
+        
+        It is built on the session's first command and reused afterwards;
+        Popen only reads the environment dict, so one copy can be shared.
+        """
+        with self._env_lock:
+            cached = self._env_cache.get(session_id)
+            if cached is not None and cached['HOME'] == home_dir:
+                self._env_cache.move_to_end(session_id)
+                return cached
+        
+        env = self._build_env(os.environ, home_dir)
+        
+        with self._env_lock:
+            self._env_cache[session_id] = env
+            while len(self._env_cache) > ENV_CACHE_SIZE:
+                self._env_cache.popitem(last=False)
+        return env
+    
+    def _stream_output_with_callback(self, entry, session_id, callback, on_stdout=None, on_stderr=None):
+        """
+        Hand the process output pipes to the reactor, which calls the callback with each chunk.
+        
+        on_stdout and on_stderr take the output of one pipe instead of the
+        callback; the callback is still called with the exit code.
+        """
+        process = entry.process
+        stream = {
+            'entry': entry,  # Keeps the session's process tracking alive until completion
+            'process': process,
+            'session_id': session_id,
+            'callback': callback,
+            'open_pipes': 2
+        }
+        pipes = ((process.stdout, on_stdout or callback), (process.stderr, on_stderr or callback))
+        for pipe, on_output in pipes:
+            # Read the unbuffered pipe ends directly, without blocking the reactor.
+            # Each pipe gets its own decoder so characters split across reads survive
+            raw = pipe.buffer.raw
+            os.set_blocking(raw.fileno(), False)
+            decoder = _utf8_decoder('replace')
+            self._selector.register(raw, selectors.EVENT_READ,
+                                    (stream, raw, self._acquire_read_buffer(), decoder, on_output))
+        
+        self._ensure_reactor()
+        self._wake_reactor()
+    
+    def _wake_reactor(self):
+        """Interrupt the reactor's select so it watches newly registered pipes"""
+        try:
+            os.write(self._wakeup_write, b'\0')
+        except BlockingIOError:
+            pass  # A wake-up is already pending
+    
+    def _ensure_reactor(self):
+        """Start the output reactor thread on first use"""
+        with self._reactor_lock:
+            if self._reactor_thread is None:
+                self._reactor_thread = threading.Thread(target=self._reactor_loop, daemon=True)
+                self._reactor_thread.start()
+    
+    def _reactor_loop(self):
+        """
+        Forward the output of all streaming commands from a single thread.
+        
+        The thread sleeps in the selector until a pipe is readable. Once both
+        pipes of a command reach EOF, a pidfd for the process is watched in the
+        same selector and the process is reaped when it becomes readable.
+        Without pidfd support, commands waiting to exit are polled with a
+        short selector timeout instead.
+        """
+        while True:
             try:
-                # File descriptors for select
-                fd_stdout = process.stdout.fileno()
-                fd_stderr = process.stderr.fileno()
-                readable = [fd_stdout, fd_stderr]
-                
-                # Stream output while process is running
-                while process.poll() is None:
-                    # Check for available output using select with timeout
-                    ready, _, _ = select.select(readable, [], [], 0.1)
-                    
-                    if fd_stdout in ready:
-                        output = os.read(fd_stdout, 1024).decode('utf-8', errors='replace')
-                        if output:
-                            callback(output)
-                    
-                    if fd_stderr in ready:
-                        error = os.read(fd_stderr, 1024).decode('utf-8', errors='replace')
-                        if error:
-                            callback(error)
-                
-                # Get any remaining output
-                stdout_remainder = process.stdout.read()
-                if stdout_remainder:
-                    callback(stdout_remainder.decode('utf-8', errors='replace'))
-                
-                stderr_remainder = process.stderr.read()
-                if stderr_remainder:
-                    callback(stderr_remainder.decode('utf-8', errors='replace'))
-                
-                # Process finished
-                exit_code = process.wait()
-                
-                # Clean up process tracking
-                with self.process_lock:
-                    if session_id in self.processes:
-                        del self.processes[session_id]
-                
-                # Send command completion event with exit code
-                callback("\n", exit_code=exit_code)
+                events = self._selector.select(timeout=0.1 if self._exiting else None)
+                for key, _ in events:
+                    if key.data is None:
+                        self._drain_wakeups()
+                    elif key.data[0] == 'exit':
+                        self._process_exited(key)
+                    else:
+                        self._forward_output(key)
                 
+                if self._exiting:
+                    self._reap_exited()
             except Exception as e:
-                logger.error(f"Error in stream_output thread: {str(e)}")
-                callback(f"\nError streaming command output: {str(e)}")
-                
-                # Clean up process tracking
-                with self.process_lock:
-                    if session_id in self.processes:
-                        del self.processes[session_id]
+                logger.error(f"Error in output reactor: {str(e)}")
+                time.sleep(0.1)
+    
+    def _forward_output(self, key):
+        """Read available output from one pipe and pass it to the command's callback"""
+        stream, raw, buf, decoder, on_output = key.data
+        try:
+            n = raw.readinto(buf)
+        except BlockingIOError:
+            return
+        except OSError:
+            n = 0
+        
+        if n is None:
+            return  # Nothing to read on the non-blocking pipe yet
         
-        # Start output streaming in a separate thread
-        threading.Thread(target=stream_output, daemon=True).start()
+        if n:
+            with memoryview(buf) as view:
+                text = decoder.decode(view[:n])
+            if text:
+                self._deliver(stream, on_output, text)
+            return
+        
+        # EOF on this pipe; flush any incomplete character
+        text = decoder.decode(b'', final=True)
+        if text:
+            self._deliver(stream, on_output, text)
+        self._selector.unregister(raw)
+        self._release_read_buffer(buf)
+        stream['open_pipes'] -= 1
+        if stream['open_pipes'] == 0:
+            self._watch_exit(stream)
+    
+    def _drain_wakeups(self):
+        """Consume the pending reactor wake-ups"""
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+    
+    def _watch_exit(self, stream):
+        """Wait for the process of a stream whose output has ended to exit"""
+        try:
+            # Readable once the process exits; reading it does not reap the
+            # process, so Popen (or gevent's child watcher) still collects the status
+            pidfd = os.pidfd_open(stream['process'].pid)
+        except (AttributeError, OSError):
+            self._exiting.append(stream)  # No pidfd support, or already reaped
+            return
+        self._selector.register(pidfd, selectors.EVENT_READ, ('exit', stream, pidfd))
+    
+    def _process_exited(self, key):
+        """Stop watching an exited process and queue its stream for completion"""
+        _, stream, pidfd = key.data
+        self._selector.unregister(pidfd)
+        os.close(pidfd)
+        self._exiting.append(stream)
+    
+    def _reap_exited(self):
+        """Complete the commands whose output has ended and whose process has exited"""
+        still_running = []
+        for stream in self._exiting:
+            process = stream['process']
+            exit_code = process.poll()
+            if exit_code is None:
+                still_running.append(stream)
+                continue
+            
+            process.stdout.close()
+            process.stderr.close()
+            
+            # Drops the session's process tracking
+            del stream['entry']
+            
+            # Send command completion event with exit code
+            self._deliver(stream, stream['callback'], "\n", exit_code=exit_code)
+        
+        self._exiting = still_running
+    
+    @staticmethod
+    def _deliver(stream, callback, text, exit_code=None):
+        """Call one of a command's output callbacks, keeping callback errors out of the reactor"""
+        try:
+            if exit_code is None:
+                callback(text)
+            else:
+                callback(text, exit_code=exit_code)
+        except Exception as e:
+            logger.error(f"Error in output callback for session {stream['session_id']}: {str(e)}")
+    
+    def _acquire_text_buffer(self):
+        """Take an empty text buffer from the pool for collecting a command's output lines"""
+        try:
+            return self._text_buffers.pop()
+        except IndexError:
+            return io.StringIO()
+    
+    def _release_text_buffer(self, buf):
+        """Return a text buffer to the pool and give back the text written to it"""
+        text = buf.getvalue()
+        # Buffers that grew large are dropped rather than kept alive in the pool
+        if buf.tell() <= TEXT_BUFFER_MAX_SIZE and len(self._text_buffers) < TEXT_BUFFER_POOL_SIZE:
+            buf.seek(0)
+            buf.truncate(0)
+            self._text_buffers.append(buf)
+        return text
+    
+    def _acquire_read_buffer(self):
+        """Take a read buffer from the pool, allocating one if the pool is empty"""
+        try:
+            return self._read_buffers.pop()
+        except IndexError:
+            return bytearray(READ_BUFFER_SIZE)
+    
+    def _release_read_buffer(self, buf):
+        """Return a read buffer to the pool"""
+        if len(self._read_buffers) < READ_BUFFER_POOL_SIZE:
+            self._read_buffers.append(buf)
 
     def terminate_process(self, session_id):
         """Terminate a running process for a session"""
-        with self.process_lock:
-            if session_id in self.processes:
-                try:
-                    process_info = self.processes[session_id]
-                    process = process_info['process']
-                    # Send SIGTERM to the process group
-                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    logger.info(f"Terminated process for session {session_id}")
-                    return True
-                except Exception as e:
-                    logger.error(f"Error terminating process: {str(e)}")
-                finally:
-                    # Remove from tracking even if termination failed
-                    del self.processes[session_id]
+        # The session is ending or reconnecting; rebuild its environment next time
+        with self._env_lock:
+            self._env_cache.pop(session_id, None)
+        
+        # Remove from tracking even if termination fails
+        entry = self.processes.pop(session_id, None)
+        if entry is None:
+            return False
+        
+        try:
+            # Send SIGTERM to the process group
+            os.killpg(os.getpgid(entry.process.pid), signal.SIGTERM)
+            logger.info(f"Terminated process for session {session_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error terminating process: {str(e)}")
         return False
 
-    def _handle_file_operations(self, command, home_dir, callback=None):
+    def _handle_file_operations(self, command, home_dir, callback=None, home_real=None):
         """
         Handle file operations directly through terminal commands.
         This replaces the HTTP endpoints for file operations.
         
+        Args:
+            command: The command to execute
+            home_dir: The user's home directory
+            callback: Function to call with streaming output
+            home_real: The home directory with symlinks resolved, if already known
+        
         Returns:
             Dict with operation result if command is a file operation, None otherwise
         """
@@ -254,435 +504,423 @@ class TerminalCommandHandler:
                 # Just modify the command and let it execute normally
                 return {"modified_command": openssl_result["command"], "env": openssl_result.get("env")}
         
-        # Check if this is an enhanced file operation command that needs special handling
-        if command.startswith("ls") or command.startswith("pwd") or command.startswith("cd"):
-            # These can be handled by the normal shell execution
+        # Everything without a built-in handler (ls, pwd, cd, ...) is executed
+        # by the normal shell; one regex match rejects those before tokenizing
+        match = _FILE_OP_RE.match(command)
+        if match is None:
+            return None
+        handler = self._file_ops[match.group(1)]
+        
+        # Tokenize once; quoting is handled by shlex, and anything it cannot
+        # parse is left for the shell to report
+        try:
+            tokens = _split_command(command)
+        except ValueError:
+            return None
+        
+        if home_real is None:
+            home_real = os.path.realpath(home_dir)
+        
+        return handler(tokens[1:], home_dir, home_real, callback)
+    
+    @staticmethod
+    def _safe_resolve(path, home_dir, home_real, follow_symlinks=True):
+        """
+        Resolve a command path argument against the user's home directory.
+        
+        Symlinks and .. components are resolved before the check, so neither
+        can be used to escape the home directory. With follow_symlinks=False
+        the final component is kept as is (for commands such as rm that act
+        on a link itself).
+        
+        Returns:
+            The resolved absolute path, or None if it is outside the home directory
+        """
+        # Handle ~ in paths; ~user refers to another user's home directory
+        if path == "~" or path.startswith("~/"):
+            path = home_dir + path[1:]
+        elif path.startswith("~"):
+            return None
+        elif not path.startswith("/"):
+            # Relative path
+            path = os.path.join(home_dir, path)
+        
+        parent, name = os.path.split(path)
+        if follow_symlinks or name in ('', '.', '..'):
+            path = os.path.realpath(path)
+        else:
+            path = os.path.join(os.path.realpath(parent), name)
+        
+        # Compare whole path components so /home/u1 cannot match /home/u10
+        if os.path.commonpath([path, home_real]) != home_real:
+            return None
+        return path
+    
+    def _cat(self, args, home_dir, home_real, callback):
+        """File content commands (cat, more, less)"""
+        if not args:
+            return {"error": "File path required", "exit_code": 1}
+        
+        # Multiple files, options and pipelines are left to the shell
+        if len(args) > 1 or args[0].startswith("-"):
             return None
             
-        # File content commands (cat, more, less)
-        if command.startswith("cat ") or command.startswith("more ") or command.startswith("less "):
-            # Extract the file path from the command
-            parts = command.split(" ", 1)
-            if len(parts) < 2:
-                return {"error": "File path required", "exit_code": 1}
-                
-            file_arg = parts[1].strip()
-            
-            # Process any quotes or special characters in the filename
-            file_arg = file_arg.strip('"\'')
-            
-            # Handle ~ in paths
-            if file_arg.startswith("~"):
-                file_arg = file_arg.replace("~", home_dir, 1)
-            elif not file_arg.startswith("/"):
-                # Relative path
-                file_arg = os.path.join(home_dir, file_arg)
-            
-            # Verify the path is within the home directory for security
-            file_arg = os.path.normpath(file_arg)
-            if not file_arg.startswith(home_dir):
-                return {"error": "Access denied. Path outside of user directory.", "exit_code": 1}
-                
-            try:
-                if not os.path.exists(file_arg):
-                    return {"error": f"No such file or directory: {os.path.basename(file_arg)}", "exit_code": 1}
-                    
-                if os.path.isdir(file_arg):
-                    return {"error": f"{os.path.basename(file_arg)} is a directory", "exit_code": 1}
-                    
-                # Read and return the file content
-                with open(file_arg, 'r', errors='replace') as f:
-                    content = f.read()
-                    
-                # Call callback if provided (WebSocket)
-                if callback:
-                    callback(content)
-                    callback("\n", exit_code=0)
-                    return {"message": "File content streamed", "exit_code": 0}
-                    
-                return {"output": content, "exit_code": 0}
-                
-            except Exception as e:
-                logger.error(f"Error reading file: {str(e)}")
-                return {"error": f"Error reading file: {str(e)}", "exit_code": 1}
-        
-        # File creation/editing commands
-        if command.startswith("echo ") and ">" in command:
-            # Parse the command to extract content and file path
-            # This handles commands like: echo "content" > file.txt or echo "content" >> file.txt
-            append_mode = ">>" in command
-            
-            # Remove the echo and determine where the redirection starts
-            parts = command[5:]  # Remove 'echo '
+        file_arg = args[0]
+        
+        # Resolve the path and verify it is within the home directory for security
+        resolved = self._safe_resolve(file_arg, home_dir, home_real)
+        if resolved is None:
+            return {"error": "Access denied. Path outside of user directory.", "exit_code": 1}
             
-            # Find the position of the first > character, handling >>
-            redirect_pos = parts.find(">")
-            if append_mode:
-                redirect_pos = parts.find(">>")
-                
-            if redirect_pos == -1:
-                return None  # Not a file write operation, let the shell handle it
-                
-            # Extract content and filepath
-            content = parts[:redirect_pos].strip()
-            if append_mode:
-                filepath = parts[redirect_pos+2:].strip()
-            else:
-                filepath = parts[redirect_pos+1:].strip()
-                
-            # Remove quotes if present
-            if content.startswith('"') and content.endswith('"'):
-                content = content[1:-1]
-            elif content.startswith("'") and content.endswith("'"):
-                content = content[1:-1]
-                
-            # Handle ~ in paths
-            if filepath.startswith("~"):
-                filepath = filepath.replace("~", home_dir, 1)
-            elif not filepath.startswith("/"):
-                # Relative path
-                filepath = os.path.join(home_dir, filepath)
-                
-            # Verify the path is within the home directory for security
-            filepath = os.path.normpath(filepath)
-            if not filepath.startswith(home_dir):
-                return {"error": "Access denied. Path outside of user directory.", "exit_code": 1}
-                
-            try:
-                # Create parent directories if they don't exist
-                os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        file_arg = resolved
+        
+        try:
+            if not os.path.exists(file_arg):
+                return {"error": f"No such file or directory: {os.path.basename(file_arg)}", "exit_code": 1}
                 
-                # Write to the file
-                mode = "a" if append_mode else "w"
-                with open(filepath, mode) as f:
-                    f.write(content)
-                    
-                if callback:
-                    callback(f"{'Appended to' if append_mode else 'Wrote to'} {os.path.basename(filepath)}\n")
-                    callback("\n", exit_code=0)
-                    return {"message": f"File {'appended' if append_mode else 'written'}", "exit_code": 0}
-                    
-                return {"output": f"{'Appended to' if append_mode else 'Wrote to'} {os.path.basename(filepath)}", "exit_code": 0}
+            if os.path.isdir(file_arg):
+                return {"error": f"{os.path.basename(file_arg)} is a directory", "exit_code": 1}
                 
-            except Exception as e:
-                logger.error(f"Error writing to file: {str(e)}")
-                return {"error": f"Error writing to file: {str(e)}", "exit_code": 1}
+            # Call callback if provided (WebSocket)
+            if callback:
+                self._stream_file(file_arg, callback)
+                callback("\n", exit_code=0)
+                return {"message": "File content streamed", "exit_code": 0}
                 
-        # mkdir - Directory creation
-        if command.startswith("mkdir "):
-            parts = command.split(" ", 1)
-            if len(parts) < 2:
-                return {"error": "Directory path required", "exit_code": 1}
+            # Read and return the file content
+            with open(file_arg, 'r', errors='replace') as f:
+                content = f.read()
                 
-            dir_arg = parts[1].strip()
+            return {"output": content, "exit_code": 0}
             
-            # Remove flags, keeping just the directory name(s)
-            if dir_arg.startswith("-"):
-                flag_end = dir_arg.find(" ")
-                if flag_end == -1:
-                    return {"error": "Directory path required", "exit_code": 1}
-                dir_arg = dir_arg[flag_end+1:].strip()
-                
-            # Process multiple directories (space-separated)
-            dir_paths = dir_arg.split()
-            results = []
+        except Exception as e:
+            logger.error(f"Error reading file: {str(e)}")
+            return {"error": f"Error reading file: {str(e)}", "exit_code": 1}
+    
+    @staticmethod
+    def _stream_file(path, callback):
+        """Send a file to the callback in fixed-size chunks, so memory use does not grow with the file"""
+        # The incremental decoder keeps multi-byte characters split across chunks intact
+        decoder = _utf8_decoder('replace')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b''):
+                text = decoder.decode(chunk)
+                if text:
+                    callback(text)
+        
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            callback(tail)
+    
+    def _echo(self, args, home_dir, home_real, callback):
+        """File creation/editing commands: echo "content" > file.txt or echo "content" >> file.txt"""
+        # The tokenizer keeps > and >> as separate tokens, even when written
+        # without surrounding spaces or next to quoted text containing >.
+        # Only a single trailing redirection to a plain target is emulated;
+        # anything else (no redirection, pipes, several redirections) goes to the shell.
+        if len(args) < 2 or args[-2] not in (">", ">>") or not _SHELL_OPERATORS.isdisjoint(args[:-2]):
+            return None
             
-            for dir_path in dir_paths:
-                # Process any quotes or special characters in the path
-                dir_path = dir_path.strip('"\'')
-                
-                # Handle ~ in paths
-                if dir_path.startswith("~"):
-                    dir_path = dir_path.replace("~", home_dir, 1)
-                elif not dir_path.startswith("/"):
-                    # Relative path
-                    dir_path = os.path.join(home_dir, dir_path)
-                
-                # Verify the path is within the home directory for security
-                dir_path = os.path.normpath(dir_path)
-                if not dir_path.startswith(home_dir):
-                    results.append(f"mkdir: {dir_path}: Access denied. Path outside of user directory.")
-                    continue
-                    
-                try:
-                    # Create directory (and parent directories if -p flag was used)
-                    # We'll always create parent directories for better user experience
-                    os.makedirs(dir_path, exist_ok=True)
-                    # No output on success (Unix behavior)
-                except Exception as e:
-                    logger.error(f"Error creating directory: {str(e)}")
-                    results.append(f"mkdir: {dir_path}: {str(e)}")
+        append_mode = args[-2] == ">>"
+        content = " ".join(args[:-2])
+        filepath = args[-1]
             
-            if results:
-                # Only report errors
-                result_text = "\n".join(results)
-                if callback:
-                    callback(result_text + "\n")
-                    callback("\n", exit_code=1)
-                    return {"message": "Directory creation errors", "exit_code": 1}
-                return {"error": result_text, "exit_code": 1}
-            else:
-                # Success - no output for mkdir (Unix behavior)
-                if callback:
-                    callback("\n", exit_code=0)
-                    return {"message": "Directory created", "exit_code": 0}
-                return {"output": "", "exit_code": 0}
+        # Resolve the path and verify it is within the home directory for security
+        resolved = self._safe_resolve(filepath, home_dir, home_real)
+        if resolved is None:
+            return {"error": "Access denied. Path outside of user directory.", "exit_code": 1}
+            
+        filepath = resolved
+        
+        try:
+            # Create parent directories if they don't exist; the home directory itself always does
+            parent = os.path.dirname(filepath)
+            if parent != home_real:
+                os.makedirs(parent, exist_ok=True)
+            
+            # Write to the file with plain fd calls; no buffered file object is needed
+            flags = os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC | (os.O_APPEND if append_mode else os.O_TRUNC)
+            fd = os.open(filepath, flags, 0o644)
+            try:
+                data = memoryview(content.encode('utf-8', errors='replace'))
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
                 
-        # rm - File/directory removal
-        if command.startswith("rm "):
-            parts = command.split(" ", 1)
-            if len(parts) < 2:
-                return {"error": "Path required", "exit_code": 1}
+            if callback:
+                callback(f"{'Appended to' if append_mode else 'Wrote to'} {os.path.basename(filepath)}\n")
+                callback("\n", exit_code=0)
+                return {"message": f"File {'appended' if append_mode else 'written'}", "exit_code": 0}
                 
-            args = parts[1].strip()
+            return {"output": f"{'Appended to' if append_mode else 'Wrote to'} {os.path.basename(filepath)}", "exit_code": 0}
             
-            # Parse flags
-            recursive = False
-            force = False
-            verbose = False
+        except Exception as e:
+            logger.error(f"Error writing to file: {str(e)}")
+            return {"error": f"Error writing to file: {str(e)}", "exit_code": 1}
+    
+    def _mkdir(self, args, home_dir, home_real, callback):
+        """mkdir - Directory creation"""
+        if any(arg in _SHELL_OPERATORS for arg in args):
+            return None
+        
+        # Remove flags, keeping just the directory name(s)
+        dir_paths = [arg for arg in args if not arg.startswith("-")]
+        if not dir_paths:
+            return {"error": "Directory path required", "exit_code": 1}
             
-            if args.startswith("-"):
-                flag_end = 0
-                while flag_end < len(args) and args[flag_end] != " ":
-                    flag_end += 1
+        results = self._acquire_text_buffer()
+        
+        for dir_path in dir_paths:
+            # Resolve the path and verify it is within the home directory for security
+            resolved = self._safe_resolve(dir_path, home_dir, home_real)
+            if resolved is None:
+                results.write(f"mkdir: {dir_path}: Access denied. Path outside of user directory.\n")
+                continue
                 
-                flags = args[:flag_end]
-                if "r" in flags or "R" in flags:
-                    recursive = True
-                if "f" in flags:
-                    force = True
-                if "v" in flags:
-                    verbose = True
-                    
-                args = args[flag_end:].strip()
+            dir_path = resolved
             
-            # Process multiple paths (space-separated)
-            paths = args.split()
-            results = []
-            success = True
+            try:
+                # Create directory (and parent directories if -p flag was used)
+                # We'll always create parent directories for better user experience
+                os.makedirs(dir_path, exist_ok=True)
+                # No output on success (Unix behavior)
+            except Exception as e:
+                logger.error(f"Error creating directory: {str(e)}")
+                results.write(f"mkdir: {dir_path}: {str(e)}\n")
+        
+        result_text = self._release_text_buffer(results)
+        if result_text:
+            # Only report errors
+            if callback:
+                callback(result_text)
+                callback("\n", exit_code=1)
+                return {"message": "Directory creation errors", "exit_code": 1}
+            return {"error": result_text[:-1], "exit_code": 1}
+        else:
+            # Success - no output for mkdir (Unix behavior)
+            if callback:
+                callback("\n", exit_code=0)
+                return {"message": "Directory created", "exit_code": 0}
+            return {"output": "", "exit_code": 0}
+    
+    def _rm(self, args, home_dir, home_real, callback):
+        """rm - File/directory removal"""
+        if any(arg in _SHELL_OPERATORS for arg in args):
+            return None
+        
+        # Parse flags; options this emulation does not know are left to the real rm
+        try:
+            opts, paths = getopt.gnu_getopt(args, "rRfv", ["recursive", "force", "verbose"])
+        except getopt.GetoptError:
+            return None
+        
+        if not paths:
+            return {"error": "Path required", "exit_code": 1}
             
-            for path in paths:
-                # Process any quotes or special characters in the path
-                path = path.strip('"\'')
-                
-                # Handle ~ in paths
-                if path.startswith("~"):
-                    path = path.replace("~", home_dir, 1)
-                elif not path.startswith("/"):
-                    # Relative path
-                    path = os.path.join(home_dir, path)
+        flags = {opt for opt, _ in opts}
+        recursive = bool(flags & {"-r", "-R", "--recursive"})
+        force = bool(flags & {"-f", "--force"})
+        verbose = bool(flags & {"-v", "--verbose"})
+        
+        results = self._acquire_text_buffer()
+        success = True
+        
+        for path in paths:
+            # Resolve the path and verify it is within the home directory for security
+            resolved = self._safe_resolve(path, home_dir, home_real, follow_symlinks=False)
+            if resolved is None:
+                results.write(f"rm: {path}: Access denied. Path outside of user directory.\n")
+                success = False
+                continue
                 
-                # Verify the path is within the home directory for security
-                path = os.path.normpath(path)
-                if not path.startswith(home_dir):
-                    results.append(f"rm: {path}: Access denied. Path outside of user directory.")
-                    success = False
+            path = resolved
+            
+            try:
+                # One lstat answers both existence and type; a symlink to a
+                # directory is removed as a link
+                try:
+                    mode = os.lstat(path).st_mode
+                except FileNotFoundError:
+                    if not force:
+                        results.write(f"rm: {path}: No such file or directory\n")
+                        success = False
                     continue
                     
-                try:
-                    if not os.path.exists(path):
-                        if not force:
-                            results.append(f"rm: {path}: No such file or directory")
-                            success = False
-                        continue
-                        
-                    if os.path.isdir(path):
-                        if recursive:
-                            shutil.rmtree(path)
-                            if verbose:
-                                results.append(f"removed directory '{path}'")
-                        else:
-                            results.append(f"rm: {path}: is a directory")
-                            success = False
-                    else:
-                        os.remove(path)
+                if stat.S_ISDIR(mode):
+                    if recursive:
+                        # rmtree already walks with directory file descriptors
+                        # (os.scandir/unlink with dir_fd) where the platform allows
+                        shutil.rmtree(path)
                         if verbose:
-                            results.append(f"removed '{path}'")
-                except Exception as e:
-                    logger.error(f"Error removing path: {str(e)}")
-                    results.append(f"rm: {path}: {str(e)}")
-                    success = False
+                            results.write(f"removed directory '{path}'\n")
+                    else:
+                        results.write(f"rm: {path}: is a directory\n")
+                        success = False
+                else:
+                    os.remove(path)
+                    if verbose:
+                        results.write(f"removed '{path}'\n")
+            except Exception as e:
+                logger.error(f"Error removing path: {str(e)}")
+                results.write(f"rm: {path}: {str(e)}\n")
+                success = False
+        
+        result_text = self._release_text_buffer(results)
+        if result_text:
+            if callback:
+                callback(result_text)
+                callback("\n", exit_code=0 if success else 1)
+                return {"message": "Removal completed", "exit_code": 0 if success else 1}
+            return {"output" if success else "error": result_text[:-1], "exit_code": 0 if success else 1}
+        else:
+            # No output on success without verbose flag (Unix behavior)
+            if callback:
+                callback("\n", exit_code=0)
+                return {"message": "Removal completed", "exit_code": 0}
+            return {"output": "", "exit_code": 0}
+    
+    def _touch(self, args, home_dir, home_real, callback):
+        """touch - Create empty files"""
+        # Options and other shell syntax are left to the real touch
+        if any(arg in _SHELL_OPERATORS or arg.startswith("-") for arg in args):
+            return None
+        
+        if not args:
+            return {"error": "File path required", "exit_code": 1}
             
-            if results:
-                result_text = "\n".join(results)
-                if callback:
-                    callback(result_text + "\n")
-                    callback("\n", exit_code=0 if success else 1)
-                    return {"message": "Removal completed", "exit_code": 0 if success else 1}
-                return {"output" if success else "error": result_text, "exit_code": 0 if success else 1}
-            else:
-                # No output on success without verbose flag (Unix behavior)
-                if callback:
-                    callback("\n", exit_code=0)
-                    return {"message": "Removal completed", "exit_code": 0}
-                return {"output": "", "exit_code": 0}
-                
-        # touch - Create empty files
-        if command.startswith("touch "):
-            parts = command.split(" ", 1)
-            if len(parts) < 2:
-                return {"error": "File path required", "exit_code": 1}
+        results = self._acquire_text_buffer()
+        success = True
+        ready_dirs = {home_real}  # Parent directories known to exist
+        
+        for file_path in args:
+            # Resolve the path and verify it is within the home directory for security
+            resolved = self._safe_resolve(file_path, home_dir, home_real)
+            if resolved is None:
+                results.write(f"touch: {file_path}: Access denied. Path outside of user directory.\n")
+                success = False
+                continue
                 
-            file_args = parts[1].strip()
+            file_path = resolved
             
-            # Process multiple files (space-separated)
-            file_paths = file_args.split()
-            results = []
-            success = True
-            
-            for file_path in file_paths:
-                # Process any quotes or special characters in the path
-                file_path = file_path.strip('"\'')
-                
-                # Handle ~ in paths
-                if file_path.startswith("~"):
-                    file_path = file_path.replace("~", home_dir, 1)
-                elif not file_path.startswith("/"):
-                    # Relative path
-                    file_path = os.path.join(home_dir, file_path)
-                
-                # Verify the path is within the home directory for security
-                file_path = os.path.normpath(file_path)
-                if not file_path.startswith(home_dir):
-                    results.append(f"touch: {file_path}: Access denied. Path outside of user directory.")
-                    success = False
-                    continue
-                    
+            try:
                 try:
-                    # Create parent directories if they don't exist
-                    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+                    # Update the file access and modification times
+                    os.utime(file_path, None)
+                except FileNotFoundError:
+                    # Create parent directories if they don't exist, once per directory
+                    parent = os.path.dirname(file_path)
+                    if parent not in ready_dirs:
+                        os.makedirs(parent, exist_ok=True)
+                        ready_dirs.add(parent)
                     
-                    # Update the file access and modification times, create if it doesn't exist
-                    with open(file_path, 'a'):
-                        os.utime(file_path, None)
-                except Exception as e:
-                    logger.error(f"Error touching file: {str(e)}")
-                    results.append(f"touch: {file_path}: {str(e)}")
-                    success = False
-            
-            if results:
-                result_text = "\n".join(results)
-                if callback:
-                    callback(result_text + "\n")
-                    callback("\n", exit_code=0 if success else 1)
-                    return {"message": "Touch completed", "exit_code": 0 if success else 1}
-                return {"output" if success else "error": result_text, "exit_code": 0 if success else 1}
-            else:
-                # No output on success (Unix behavior)
-                if callback:
-                    callback("\n", exit_code=0)
-                    return {"message": "Touch completed", "exit_code": 0}
-                return {"output": "", "exit_code": 0}
-        
-        # grep - Search files for patterns
-        if command.startswith("grep "):
-            parts = command.split(" ", 1)
-            if len(parts) < 2:
-                return {"error": "Usage: grep [OPTIONS] PATTERN [FILE...]", "exit_code": 1}
-            
-            # This is a simplified implementation - a real solution would parse all grep options
-            args = parts[1].strip()
-            
-            # Process all arguments
-            pattern = None
-            files = []
-            is_pattern = True
-            
-            # Very simple arg parser - this doesn't handle all grep options
-            for arg in args.split():
-                if arg.startswith('-'):
-                    # This is an option, skip it for now
-                    continue
-                elif is_pattern and pattern is None:
-                    pattern = arg
-                    is_pattern = False
-                else:
-                    files.append(arg)
-            
-            if not pattern:
-                return {"error": "No pattern specified", "exit_code": 1}
-            
-            if not files:
-                # No files specified, let the shell handle it (might be piped input)
-                return None
-            
-            # Process each file
-            results = []
-            found_matches = False
-            
-            for file_path in files:
-                # Handle ~ in paths
-                if file_path.startswith("~"):
-                    file_path = file_path.replace("~", home_dir, 1)
-                elif not file_path.startswith("/"):
-                    # Relative path
-                    file_path = os.path.join(home_dir, file_path)
+                    # Create the file
+                    os.close(os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC, 0o644))
+            except Exception as e:
+                logger.error(f"Error touching file: {str(e)}")
+                results.write(f"touch: {file_path}: {str(e)}\n")
+                success = False
+        
+        result_text = self._release_text_buffer(results)
+        if result_text:
+            if callback:
+                callback(result_text)
+                callback("\n", exit_code=0 if success else 1)
+                return {"message": "Touch completed", "exit_code": 0 if success else 1}
+            return {"output" if success else "error": result_text[:-1], "exit_code": 0 if success else 1}
+        else:
+            # No output on success (Unix behavior)
+            if callback:
+                callback("\n", exit_code=0)
+                return {"message": "Touch completed", "exit_code": 0}
+            return {"output": "", "exit_code": 0}
+    
+    def _grep(self, args, home_dir, home_real, callback):
+        """grep - Search files for patterns"""
+        if not args:
+            return {"error": "Usage: grep [OPTIONS] PATTERN [FILE...]", "exit_code": 1}
+        
+        # Piped or redirected grep is left to the shell
+        if any(arg in _SHELL_OPERATORS for arg in args):
+            return None
+        
+        # This is a simplified implementation - a real solution would parse all grep options
+        # Very simple arg parser - options are skipped
+        operands = [arg for arg in args if not arg.startswith('-')]
+        if not operands:
+            return {"error": "No pattern specified", "exit_code": 1}
+        
+        pattern = operands[0]
+        files = operands[1:]
+        
+        if not files:
+            # No files specified, let the shell handle it (might be piped input)
+            return None
+        
+        # Process each file
+        results = []
+        found_matches = False
+        
+        for file_path in files:
+            # Resolve the path and verify it is within the home directory for security
+            resolved = self._safe_resolve(file_path, home_dir, home_real)
+            if resolved is None:
+                results.append(f"grep: {file_path}: Access denied. Path outside of user directory.")
+                continue
                 
-                # Verify the path is within the home directory for security
-                file_path = os.path.normpath(file_path)
-                if not file_path.startswith(home_dir):
-                    results.append(f"grep: {file_path}: Access denied. Path outside of user directory.")
+            file_path = resolved
+            
+            try:
+                if not os.path.exists(file_path):
+                    results.append(f"grep: {file_path}: No such file or directory")
                     continue
                     
-                try:
-                    if not os.path.exists(file_path):
-                        results.append(f"grep: {file_path}: No such file or directory")
-                        continue
-                        
-                    if os.path.isdir(file_path):
-                        results.append(f"grep: {file_path}: Is a directory")
-                        continue
-                    
-                    # Read the file and grep for the pattern
-                    with open(file_path, 'r', errors='replace') as f:
-                        for i, line in enumerate(f):
-                            if pattern in line:
-                                found_matches = True
-                                # If multiple files, prefix output with filename
-                                if len(files) > 1:
-                                    results.append(f"{os.path.basename(file_path)}:{line.rstrip()}")
-                                else:
-                                    results.append(line.rstrip())
-                except Exception as e:
-                    results.append(f"grep: {file_path}: {str(e)}")
-            
-            # Return the results
-            if results:
-                result_text = "\n".join(results)
-                exit_code = 0 if found_matches else 1
-                
-                if callback:
-                    callback(result_text + "\n")
-                    callback("\n", exit_code=exit_code)
-                    return {"message": "Grep completed", "exit_code": exit_code}
-                return {"output": result_text, "exit_code": exit_code}
-            else:
-                # No matches found
-                exit_code = 1
-                if callback:
-                    callback("\n", exit_code=exit_code)
-                    return {"message": "No matches found", "exit_code": exit_code}
-                return {"output": "", "exit_code": exit_code}
-
-        # find - Search for files in a directory hierarchy
-        if command.startswith("find "):
-            # For find command, we'll let the shell handle it as it's more complex
-            # Just performing a security check on the path
-            parts = command.split(" ", 2)
-            if len(parts) >= 2:
-                path = parts[1].strip()
-                
-                # Handle ~ in paths
-                if path.startswith("~"):
-                    path = path.replace("~", home_dir, 1)
-                elif not path.startswith("/"):
-                    # Relative path
-                    path = os.path.join(home_dir, path)
+                if os.path.isdir(file_path):
+                    results.append(f"grep: {file_path}: Is a directory")
+                    continue
                 
-                # Verify the path is within the home directory for security
-                path = os.path.normpath(path)
-                if not path.startswith(home_dir):
-                    return {"error": f"find: {path}: Access denied. Path outside of user directory.", "exit_code": 1}
-
-        # If not a built-in file operation, return None to execute as a normal shell command
+                # Read the file and grep for the pattern
+                with open(file_path, 'r', errors='replace') as f:
+                    for i, line in enumerate(f):
+                        if pattern in line:
+                            found_matches = True
+                            # If multiple files, prefix output with filename
+                            if len(files) > 1:
+                                results.append(f"{os.path.basename(file_path)}:{line.rstrip()}")
+                            else:
+                                results.append(line.rstrip())
+            except Exception as e:
+                results.append(f"grep: {file_path}: {str(e)}")
+        
+        # Return the results
+        if results:
+            result_text = "\n".join(results)
+            exit_code = 0 if found_matches else 1
+            
+            if callback:
+                callback(result_text + "\n")
+                callback("\n", exit_code=exit_code)
+                return {"message": "Grep completed", "exit_code": exit_code}
+            return {"output": result_text, "exit_code": exit_code}
+        else:
+            # No matches found
+            exit_code = 1
+            if callback:
+                callback("\n", exit_code=exit_code)
+                return {"message": "No matches found", "exit_code": exit_code}
+            return {"output": "", "exit_code": exit_code}
+    
+    def _find(self, args, home_dir, home_real, callback):
+        """find - Search for files in a directory hierarchy"""
+        # For find command, we'll let the shell handle it as it's more complex
+        # Just performing a security check on the path
+        if args:
+            path = args[0]
+            
+            # Resolve the path and verify it is within the home directory for security
+            resolved = self._safe_resolve(path, home_dir, home_real)
+            if resolved is None:
+                return {"error": f"find: {path}: Access denied. Path outside of user directory.", "exit_code": 1}
+            path = resolved
+        
         return None
@@ -3,56 +3,114 @@
 Simple test script for the enhanced terminal server
 """
 
+import json
+import os
 import requests
+import requests.adapters
 import socketio
-import time
-import threading
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import websocket  # websocket-client, used by socketio.Client for the WebSocket transport
+except ImportError:
+    websocket = None
 
 # Configuration
 SERVER_URL = "http://localhost:3000"
+CREATE_SESSION_URL = f"{SERVER_URL}/create-session"
+EXECUTE_COMMAND_URL = f"{SERVER_URL}/execute-command"
+SESSION_URL = f"{SERVER_URL}/session"
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# (connect, read) timeouts for HTTP requests; commands may run for up to 60 seconds on the server
+REQUEST_TIMEOUT = (3.05, 65)
+
+# Retry failed connections and gateway errors with a short backoff
+HTTP_RETRY = Retry(
+    total=3,
+    read=False,  # Never replay a request after a read error; commands are not idempotent
+    backoff_factor=0.1,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=frozenset(["GET", "POST", "DELETE"]),
+    raise_on_status=False  # Hand the last response to the status checks
+)
+
+# Connect straight over WebSocket, skipping the long-polling handshake and
+# upgrade, when the client can; otherwise let Engine.IO pick the transport
+SOCKETIO_TRANSPORTS = ["websocket"] if websocket else None
+
+# ETag of the documentation page from the last run that verified it
+DOCUMENTATION_ETAG_FILE = os.path.join(os.path.expanduser("~"), ".cache", "terminal_server_tests", "etag")
+
+def _http_session(pool_maxsize=1):
+    """
+    Create a requests session keeping up to pool_maxsize connections to the server alive,
+    retrying transient failures.
+    
+    urllib3 already sets TCP_NODELAY on its sockets, so small request
+    bodies are not held back by Nagle's algorithm.
+    """
+    http = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=HTTP_RETRY)
+    http.mount("http://", adapter)
+    return http
+
+def _dumps(obj):
+    """Serialize a request body to JSON bytes, using orjson when available"""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode('utf-8')
+
+def _json(response):
+    """Parse a JSON response body, using orjson when available"""
+    return orjson.loads(response.content) if orjson else response.json()
 
 def test_http_api():
     """Test the HTTP API endpoints"""
     print("\n=== Testing HTTP API ===")
     
+    # One client session keeps the connection to the server alive across requests
+    with _http_session() as http:
+        return _run_http_api(http)
+
+def _run_http_api(http):
+    """Run the HTTP API checks on an open requests session"""
     # Create session
     print("Creating session...")
-    response = requests.post(f"{SERVER_URL}/create-session", json={"userId": "test-user"})
+    response = http.post(CREATE_SESSION_URL, json={"userId": "test-user"}, timeout=REQUEST_TIMEOUT)
     if response.status_code != 200:
         print(f"Error creating session: {response.status_code} {response.text}")
         return False
     
-    session_data = response.json()
+    session_data = _json(response)
     session_id = session_data.get("sessionId")
     if not session_id:
         print(f"No session ID in response: {session_data}")
         return False
     
     print(f"Session created with ID: {session_id}")
+    http.headers["X-Session-Id"] = session_id
     
     # Execute command
     print("Executing command (ls -la)...")
-    response = requests.post(
-        f"{SERVER_URL}/execute-command", 
-        headers={"X-Session-Id": session_id},
-        json={"command": "ls -la"}
-    )
+    response = http.post(EXECUTE_COMMAND_URL, json={"command": "ls -la"}, timeout=REQUEST_TIMEOUT)
     
     if response.status_code != 200:
         print(f"Error executing command: {response.status_code} {response.text}")
         return False
     
-    output = response.json().get("output", "")
+    output = _json(response).get("output", "")
     print(f"Command output:\n{output}")
     
     # Create a file
     print("Creating a file...")
-    response = requests.post(
-        f"{SERVER_URL}/execute-command", 
-        headers={"X-Session-Id": session_id},
-        json={"command": "echo 'Hello, World!' > test.txt"}
-    )
+    response = http.post(EXECUTE_COMMAND_URL, json={"command": "echo 'Hello, World!' > test.txt"}, timeout=REQUEST_TIMEOUT)
     
     if response.status_code != 200:
         print(f"Error creating file: {response.status_code} {response.text}")
@@ -60,25 +118,18 @@ def test_http_api():
     
     # View file
     print("Viewing file...")
-    response = requests.post(
-        f"{SERVER_URL}/execute-command", 
-        headers={"X-Session-Id": session_id},
-        json={"command": "cat test.txt"}
-    )
+    response = http.post(EXECUTE_COMMAND_URL, json={"command": "cat test.txt"}, timeout=REQUEST_TIMEOUT)
     
     if response.status_code != 200:
         print(f"Error viewing file: {response.status_code} {response.text}")
         return False
     
-    output = response.json().get("output", "")
+    output = _json(response).get("output", "")
     print(f"File content:\n{output}")
     
     # End session
     print("Ending session...")
-    response = requests.delete(
-        f"{SERVER_URL}/session", 
-        headers={"X-Session-Id": session_id}
-    )
+    response = http.delete(SESSION_URL, timeout=REQUEST_TIMEOUT)
     
     if response.status_code != 200:
         print(f"Error ending session: {response.status_code} {response.text}")
@@ -93,92 +144,77 @@ def test_websocket():
     
     # Create a socket.io client
     sio = socketio.Client()
-    results = {"success": False, "session_id": None, "output": ""}
-    
-    @sio.event
-    def connect():
-        print("Connected to server")
-        # Create a session
-        sio.emit("create_session", {"userId": "socket-test-user"})
+    output_chunks = []
+    timeout = 10
     
     @sio.event
     def disconnect():
         print("Disconnected from server")
     
-    @sio.on("session_created")
-    def on_session_created(data):
-        print(f"Session created: {data}")
-        results["session_id"] = data.get("sessionId")
-        
-        # Execute a command
-        sio.emit("execute_command", {
-            "command": "ls -la",
-            "session_id": results["session_id"]
-        })
-    
     @sio.on("command_output")
     def on_command_output(data):
         output = data.get("output", "")
-        results["output"] += output
+        output_chunks.append(output)
         print(f"Output: {output}", end="")
     
-    @sio.on("command_complete")
-    def on_command_complete(data):
-        print(f"\nCommand completed with exit code: {data.get('exitCode')}")
-        
-        # Create a file
-        sio.emit("execute_command", {
-            "command": "echo 'Hello from WebSocket!' > socket_test.txt",
-            "session_id": results["session_id"]
-        })
-        
-        # Wait a moment before reading the file
-        time.sleep(1)
+    try:
+        sio.connect(SERVER_URL, transports=SOCKETIO_TRANSPORTS, wait_timeout=5)
+        print("Connected to server")
         
-        # Read the file
-        sio.emit("execute_command", {
-            "command": "cat socket_test.txt",
-            "session_id": results["session_id"]
-        })
+        # The server acknowledges create_session with the session information
+        session_data = sio.call("create_session", {"userId": "socket-test-user"}, timeout=timeout)
+        print(f"Session created: {session_data}")
+        session_id = session_data.get("sessionId")
+        if not session_id:
+            print(f"No session ID in response: {session_data}")
+            return False
         
-        # Wait a moment before ending
-        time.sleep(1)
+        # execute_command is acknowledged once the command has completed,
+        # so each command runs after the previous one
+        for command in ["ls -la", "echo 'Hello from WebSocket!' > socket_test.txt", "cat socket_test.txt"]:
+            result = sio.call("execute_command", {"command": command, "session_id": session_id}, timeout=timeout)
+            result = result or {"error": "Command rejected"}
+            if "error" in result:
+                print(f"\nError executing command: {result['error']}")
+                return False
+            print(f"\nCommand completed with exit code: {result.get('exitCode')}")
         
-        # Test completed successfully
-        results["success"] = True
+        if "Hello from WebSocket!" not in "".join(output_chunks):
+            print("File content missing from the command output")
+            return False
         
         # End the session
-        sio.emit("end_session", {"session_id": results["session_id"]})
-        
-        # Disconnect
-        sio.disconnect()
-    
-    try:
-        sio.connect(SERVER_URL)
-        # Wait for completion
-        timeout = 10
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if results["success"]:
-                break
-            time.sleep(0.5)
+        sio.emit("end_session", {"session_id": session_id})
         
-        if results["success"]:
-            print("WebSocket tests completed successfully.")
-            return True
-        else:
-            print(f"WebSocket tests timed out after {timeout} seconds.")
-            return False
+        print("WebSocket tests completed successfully.")
+        return True
             
+    except socketio.exceptions.TimeoutError:
+        print(f"WebSocket tests timed out after {timeout} seconds.")
+        return False
     except Exception as e:
         print(f"Error in WebSocket test: {str(e)}")
         return False
+    finally:
+        # Stop the client's background threads on timeout or error too
+        if sio.connected:
+            sio.disconnect()
 
 def test_documentation():
     """Test that documentation endpoint is preserved"""
     print("\n=== Testing Documentation Endpoint ===")
     
-    response = requests.get(SERVER_URL)
+    # Ask for the page only if it changed since it last passed this test
+    etag = _read_documentation_etag()
+    headers = {"If-None-Match": etag} if etag else None
+    
+    with _http_session() as http:
+        response = http.get(SERVER_URL, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        print("Documentation unchanged since it was last verified.")
+        print("Documentation endpoint test successful.")
+        return True
+    
     if response.status_code != 200:
         print(f"Error accessing documentation: {response.status_code}")
         return False
@@ -188,29 +224,102 @@ def test_documentation():
         print("Response doesn't appear to be the documentation page")
         return False
     
+    _write_documentation_etag(response.headers.get("ETag"))
     print("Documentation endpoint test successful.")
     return True
 
+def _read_documentation_etag():
+    """Return the ETag of the documentation page as of the last passing run, if any"""
+    try:
+        with open(DOCUMENTATION_ETAG_FILE) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _write_documentation_etag(etag):
+    """Remember the ETag of a documentation page that passed the test"""
+    if not etag:
+        return
+    try:
+        os.makedirs(os.path.dirname(DOCUMENTATION_ETAG_FILE), exist_ok=True)
+        with open(DOCUMENTATION_ETAG_FILE, 'w') as f:
+            f.write(etag)
+    except OSError as e:
+        print(f"Could not cache documentation ETag: {str(e)}")
+
+def test_load(concurrency=50, iterations=1000):
+    """Load test: create a session, run a command and end the session, many times in parallel"""
+    print(f"\n=== Load Testing ({iterations} iterations, concurrency {concurrency}) ===")
+    
+    # Request bodies are the same for every iteration, so encode them once
+    create_body = _dumps({"userId": "load-test-user"})
+    command_body = _dumps({"command": "echo ok"})
+    
+    def worker(http):
+        """Run one iteration and return its latency, or None if it failed"""
+        start = time.perf_counter()
+        try:
+            response = http.post(CREATE_SESSION_URL, data=create_body, headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
+            session_id = _json(response).get("sessionId") if response.status_code == 200 else None
+            if not session_id:
+                return None
+            headers = {"X-Session-Id": session_id}
+            response = http.post(EXECUTE_COMMAND_URL, data=command_body, headers={**JSON_HEADERS, **headers}, timeout=REQUEST_TIMEOUT)
+            ok = response.status_code == 200
+            response = http.delete(SESSION_URL, headers=headers, timeout=REQUEST_TIMEOUT)
+            if not ok or response.status_code != 200:
+                return None
+        except (requests.RequestException, ValueError):
+            return None
+        return time.perf_counter() - start
+    
+    # Size the connection pool to the concurrency so every worker keeps its connection alive
+    with _http_session(concurrency) as http:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(lambda _: worker(http), range(iterations)))
+        elapsed = time.perf_counter() - start
+    
+    completed = sorted(latency for latency in latencies if latency is not None)
+    failed = iterations - len(completed)
+    print(f"Completed: {len(completed)}, failed: {failed}, elapsed: {elapsed:.2f}s")
+    print(f"Throughput: {len(completed) / elapsed:.1f} iterations/s ({3 * len(completed) / elapsed:.1f} requests/s)")
+    if completed:
+        p50 = completed[len(completed) // 2]
+        p99 = completed[min(len(completed) - 1, int(len(completed) * 0.99))]
+        print(f"Iteration latency: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+    
+    return failed == 0
+
 def main():
     """Run all tests"""
     print("Starting tests for Enhanced Terminal Server...")
     
-    # Test HTTP API
-    http_success = test_http_api()
-    
-    # Test WebSocket API
-    ws_success = test_websocket()
+    tests = [
+        ("HTTP API", test_http_api),
+        ("WebSocket API", test_websocket),
+        ("Documentation", test_documentation)
+    ]
     
-    # Test documentation
-    doc_success = test_documentation()
+    # The tests are independent, so run them side by side; the total time
+    # is that of the slowest test rather than the sum
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        futures = [executor.submit(test) for _, test in tests]
+        results = []
+        for (name, _), future in zip(tests, futures):
+            # A test that raises (e.g. the server is down) counts as failed
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error in {name} test: {str(e)}")
+                results.append(e)
     
     # Summary
     print("\n=== Test Summary ===")
-    print(f"HTTP API: {'✅ Passed' if http_success else '❌ Failed'}")
-    print(f"WebSocket API: {'✅ Passed' if ws_success else '❌ Failed'}")
-    print(f"Documentation: {'✅ Passed' if doc_success else '❌ Failed'}")
+    for (name, _), result in zip(tests, results):
+        print(f"{name}: {'✅ Passed' if result is True else '❌ Failed'}")
     
-    if http_success and ws_success and doc_success:
+    if all(result is True for result in results):
         print("\nAll tests passed! The enhanced server is working correctly.")
         return 0
     else:
@@ -218,4 +327,6 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    if "--load" in sys.argv[1:]:
+        sys.exit(0 if test_load() else 1)
     sys.exit(main())